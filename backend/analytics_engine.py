@@ -0,0 +1,252 @@
+"""Optional in-memory columnar analytics over the expense history.
+
+Enabled with ANALYTICS_ENGINE=numpy (requires numpy). On startup every
+expense is loaded into flat arrays (amount, timestamp, category code), one
+set per user; writes append to them, so queries never touch MongoDB and
+only ever see one user's rows. All group-bys are vectorized bincount/unique
+operations.
+
+The stores only see writes made by their own process, so the engine needs
+the API to run as a single worker process; jobs are processed in-process,
+so they are covered. With more workers each one would drift from MongoDB
+for good. The engine therefore refuses to start when WEB_CONCURRENCY (the
+worker count uvicorn and gunicorn default to) is above 1; with an explicit
+--workers flag that check cannot see, leave it off.
+"""
+import os
+import logging
+from datetime import datetime, timezone
+from collections import defaultdict
+
+# numpy is imported on first use so processes with the engine off never load it
+np = None
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_ENGINE = os.getenv("ANALYTICS_ENGINE", "off").lower()
+# Worker processes the server is started with; the engine needs exactly one
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Starting capacity of each user's columns; most users have short histories
+ANALYTICS_USER_CAPACITY = int(os.getenv("ANALYTICS_USER_CAPACITY", "64"))
+
+MS_PER_HOUR = 3_600_000
+MS_PER_DAY = 86_400_000
+PERIODS = ("day", "week", "month", "year")
+
+
+class AnalyticsUnavailableError(Exception):
+    """Raised when the columnar engine is disabled or numpy is missing"""
+
+
+def _import_numpy() -> bool:
+    """Import numpy into the module namespace; False when it is not installed"""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:  # the engine is optional
+            return False
+        np = numpy
+    return True
+
+
+def _to_ms(value) -> int:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+class ColumnarExpenses:
+    """Growable column store of (amount, timestamp ms, category code)"""
+
+    def __init__(self, capacity: int = 1024):
+        if not _import_numpy():
+            raise AnalyticsUnavailableError("numpy is not installed")
+        self.size = 0
+        self.amounts = np.empty(capacity, dtype=np.float64)
+        self.timestamps = np.empty(capacity, dtype=np.int64)
+        self.codes = np.empty(capacity, dtype=np.int32)
+        self.categories = []
+        self._category_codes = {}
+
+    @classmethod
+    def from_arrays(cls, amounts, timestamps, codes, categories):
+        store = cls(capacity=max(len(amounts), 1))
+        store.size = len(amounts)
+        store.amounts[:store.size] = amounts
+        store.timestamps[:store.size] = timestamps
+        store.codes[:store.size] = codes
+        store.categories = list(categories)
+        store._category_codes = {name: code for code, name in enumerate(store.categories)}
+        return store
+
+    def _code(self, category: str) -> int:
+        code = self._category_codes.get(category)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(category)
+            self._category_codes[category] = code
+        return code
+
+    def _reserve(self, extra: int):
+        needed = self.size + extra
+        if needed <= len(self.amounts):
+            return
+        capacity = max(needed, 2 * len(self.amounts))
+        for name in ("amounts", "timestamps", "codes"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def append(self, docs):
+        docs = list(docs)
+        self._reserve(len(docs))
+        end = self.size + len(docs)
+        self.amounts[self.size:end] = [doc["amount"] for doc in docs]
+        self.timestamps[self.size:end] = [_to_ms(doc["date"]) for doc in docs]
+        self.codes[self.size:end] = [self._code(doc.get("category") or "Other") for doc in docs]
+        self.size = end
+
+    def _columns(self, since: datetime = None, category: str = None):
+        amounts = self.amounts[:self.size]
+        timestamps = self.timestamps[:self.size]
+        codes = self.codes[:self.size]
+        mask = None
+        if since is not None:
+            mask = timestamps >= _to_ms(since)
+        if category is not None:
+            code = self._category_codes.get(category, -1)
+            mask = (codes == code) if mask is None else mask & (codes == code)
+        if mask is not None:
+            amounts, timestamps, codes = amounts[mask], timestamps[mask], codes[mask]
+        return amounts, timestamps, codes
+
+    def category_totals(self, since: datetime = None):
+        amounts, _, codes = self._columns(since)
+        totals = np.bincount(codes, weights=amounts, minlength=len(self.categories))
+        counts = np.bincount(codes, minlength=len(self.categories))
+        return [
+            {"category": name, "total": float(totals[code]), "count": int(counts[code])}
+            for code, name in enumerate(self.categories) if counts[code]
+        ]
+
+    def percentiles(self, quantiles, category: str = None, since: datetime = None):
+        amounts, _, _ = self._columns(since, category)
+        if not len(amounts):
+            return {str(q): None for q in quantiles}
+        values = np.percentile(amounts, quantiles)
+        return {str(q): float(v) for q, v in zip(quantiles, values)}
+
+    def trends(self, period: str = "month", since: datetime = None, category: str = None):
+        """Totals and counts per calendar day, week (Monday start), month or year"""
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+        amounts, timestamps, _ = self._columns(since, category)
+        if not len(amounts):
+            return []
+        if period == "day":
+            keys = (timestamps // MS_PER_DAY).astype("datetime64[D]")
+        elif period == "week":
+            days = timestamps // MS_PER_DAY
+            # Day 0 (1970-01-01) was a Thursday; shift so weeks start on Monday
+            keys = (days - (days + 3) % 7).astype("datetime64[D]")
+        else:
+            unit = "M" if period == "month" else "Y"
+            keys = timestamps.astype("datetime64[ms]").astype(f"datetime64[{unit}]")
+        buckets, inverse = np.unique(keys, return_inverse=True)
+        totals = np.bincount(inverse, weights=amounts)
+        counts = np.bincount(inverse)
+        return [
+            {"period": str(bucket), "total": float(total), "count": int(count)}
+            for bucket, total, count in zip(buckets, totals, counts)
+        ]
+
+    def rolling(self, window_days: int, since: datetime, category: str = None):
+        """Daily totals from `since` to the latest expense, with a trailing window sum"""
+        amounts, timestamps, _ = self._columns(since, category)
+        first_day = _to_ms(since) // MS_PER_DAY
+        if not len(amounts):
+            return []
+        offsets = timestamps // MS_PER_DAY - first_day
+        daily = np.bincount(offsets, weights=amounts)
+        cumulative = np.concatenate(([0.0], np.cumsum(daily)))
+        index = np.arange(len(daily))
+        window = cumulative[index + 1] - cumulative[np.maximum(0, index + 1 - window_days)]
+        days = (first_day + index).astype("datetime64[D]")
+        return [
+            {"day": str(day), "total": float(total), "rolling_total": float(rolled)}
+            for day, total, rolled in zip(days, daily, window)
+        ]
+
+    def weekday_heatmap(self, since: datetime = None, category: str = None):
+        """7x24 spend matrix: rows are Monday..Sunday, columns are UTC hours"""
+        amounts, timestamps, _ = self._columns(since, category)
+        weekday = (timestamps // MS_PER_DAY + 3) % 7
+        hour = (timestamps // MS_PER_HOUR) % 24
+        cells = np.bincount(weekday * 24 + hour, weights=amounts, minlength=7 * 24)
+        return cells.reshape(7, 24).tolist()
+
+
+class AnalyticsEngine:
+    """Holds one column store per user and keeps them in step with writes"""
+
+    def __init__(self, enabled: bool = ANALYTICS_ENGINE == "numpy"):
+        self.enabled = enabled and _import_numpy()
+        if enabled and not self.enabled:
+            logger.warning("ANALYTICS_ENGINE=numpy but numpy is not installed; engine disabled")
+        if self.enabled and WEB_CONCURRENCY > 1:
+            logger.warning(f"ANALYTICS_ENGINE=numpy needs a single worker but WEB_CONCURRENCY={WEB_CONCURRENCY}; "
+                           f"engine disabled")
+            self.enabled = False
+        self.stores = None
+        self._empty = None
+
+    def _append(self, stores, docs):
+        by_user = defaultdict(list)
+        for doc in docs:
+            by_user[doc["user_id"]].append(doc)
+        for user_id, user_docs in by_user.items():
+            store = stores.get(user_id)
+            if store is None:
+                store = stores[user_id] = ColumnarExpenses(capacity=max(ANALYTICS_USER_CAPACITY, len(user_docs)))
+            store.append(user_docs)
+
+    async def load(self, collection, batch_size: int = 50000):
+        if not self.enabled:
+            return
+        stores = {}
+        batch = []
+        projection = {"user_id": 1, "amount": 1, "date": 1, "category": 1, "_id": 0}
+        cursor = collection.find({}, projection).batch_size(batch_size)
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                self._append(stores, batch)
+                batch = []
+        if batch:
+            self._append(stores, batch)
+        self._empty = ColumnarExpenses(capacity=1)
+        self.stores = stores
+        logger.info(f"Analytics engine loaded {sum(store.size for store in stores.values())} expenses "
+                    f"for {len(stores)} users")
+
+    def append(self, docs):
+        if self.stores is not None:
+            self._append(self.stores, docs)
+
+    def clear(self, user_id: str):
+        if self.stores is not None:
+            self.stores.pop(user_id, None)
+
+    def require(self, user_id: str) -> ColumnarExpenses:
+        """The store of `user_id`; an empty one when they have no expenses yet"""
+        if self.stores is None:
+            raise AnalyticsUnavailableError("Analytics engine is not enabled")
+        return self.stores.get(user_id) or self._empty
+
+
+analytics_engine = AnalyticsEngine()
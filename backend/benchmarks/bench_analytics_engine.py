@@ -0,0 +1,137 @@
+"""Benchmark suite for the columnar analytics engine.
+
+Builds synthetic column stores at each size and times category totals,
+monthly/weekly trends, percentiles, rolling windows and the weekday
+heatmap. With --mongo, the same rows are also seeded into a scratch
+database and the equivalent $group pipelines are timed against
+MongoDB for comparison. Use a disposable local mongod.
+
+Run from the repository root:
+    python backend/benchmarks/bench_analytics_engine.py --sizes 100000 1000000 10000000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from analytics_engine import ColumnarExpenses
+from gemini_utils import EXPENSE_CATEGORIES
+
+DAY_MS = 86_400_000
+
+
+def synthetic_store(rows: int, days: int, seed: int = 11):
+    rng = np.random.default_rng(seed)
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    amounts = np.round(rng.uniform(10, 5000, rows), 2)
+    timestamps = now_ms - rng.integers(0, days * DAY_MS, rows)
+    codes = rng.integers(0, len(EXPENSE_CATEGORIES), rows)
+    return ColumnarExpenses.from_arrays(amounts, timestamps, codes, EXPENSE_CATEGORIES)
+
+
+def time_call(fn, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def engine_queries(store, now):
+    six_months_ago = now - timedelta(days=180)
+    return {
+        "category_totals": lambda: store.category_totals(),
+        "monthly_trends": lambda: store.trends("month", six_months_ago),
+        "weekly_trends": lambda: store.trends("week", now - timedelta(days=28)),
+        "percentiles": lambda: store.percentiles([50, 90, 99]),
+        "rolling_30d": lambda: store.rolling(30, now - timedelta(days=365)),
+        "heatmap": lambda: store.weekday_heatmap(),
+    }
+
+
+def mongo_pipelines(now):
+    return {
+        "category_totals": [{"$group": {"_id": "$category", "total": {"$sum": "$amount"}, "count": {"$sum": 1}}}],
+        "monthly_trends": [
+            {"$match": {"date": {"$gte": now - timedelta(days=180)}}},
+            {"$group": {"_id": {"year": {"$year": "$date"}, "month": {"$month": "$date"}},
+                        "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+        ],
+        "weekly_trends": [
+            {"$match": {"date": {"$gte": now - timedelta(days=28)}}},
+            {"$group": {"_id": {"week": {"$week": "$date"}, "year": {"$year": "$date"}},
+                        "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+        ],
+        "percentiles": [{"$group": {"_id": None, "p": {"$percentile": {
+            "input": "$amount", "p": [0.5, 0.9, 0.99], "method": "approximate"}}}}],
+        "heatmap": [{"$group": {"_id": {"dow": {"$isoDayOfWeek": "$date"}, "hour": {"$hour": "$date"}},
+                                "total": {"$sum": "$amount"}}}],
+    }
+
+
+async def seed_mongo(collection, store):
+    batch = []
+    for amount, ts, code in zip(store.amounts[:store.size].tolist(),
+                                store.timestamps[:store.size].tolist(),
+                                store.codes[:store.size].tolist()):
+        batch.append({"title": "synthetic", "amount": amount,
+                      "date": datetime.fromtimestamp(ts / 1000, timezone.utc),
+                      "category": store.categories[code]})
+        if len(batch) == 10000:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+async def time_mongo(collection, pipelines, repeats: int):
+    results = {}
+    for name, pipeline in pipelines.items():
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            await collection.aggregate(pipeline).to_list(length=None)
+            samples.append((time.perf_counter() - start) * 1000)
+        results[name] = statistics.median(samples)
+    return results
+
+
+async def run(args):
+    now = datetime.now(timezone.utc)
+    client = None
+    if args.mongo:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+
+    for rows in args.sizes:
+        store = synthetic_store(rows, args.days)
+        print(f"\n{rows:,} rows")
+        engine = {name: time_call(fn, args.repeats) for name, fn in engine_queries(store, now).items()}
+        mongo = {}
+        if client is not None:
+            db = client[args.database]
+            await client.drop_database(args.database)
+            await seed_mongo(db.expenses, store)
+            mongo = await time_mongo(db.expenses, mongo_pipelines(now), args.repeats)
+            await client.drop_database(args.database)
+        for name, elapsed in engine.items():
+            baseline = f"{mongo[name]:10.1f}ms" if name in mongo else f"{'-':>12}"
+            print(f"  {name:>16} numpy {elapsed:8.2f}ms   mongo {baseline}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--days", type=int, default=5 * 365)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--mongo", action="store_true", help="also time $group pipelines on a local mongod")
+    parser.add_argument("--database", default="expense_tracker_bench")
+    asyncio.run(run(parser.parse_args()))
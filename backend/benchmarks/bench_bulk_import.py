@@ -0,0 +1,78 @@
+"""Throughput benchmark for POST /expenses/bulk against a local mongod.
+
+Gemini is replaced by a stub with injected latency. Rows are written to
+the database named by --database (dropped before and after the run), so
+point MONGODB_URI at a disposable local mongod.
+
+Run from the repository root:
+    python backend/benchmarks/bench_bulk_import.py --rows 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx
+
+import main
+import database
+from llm_client import LLMClient, set_llm_client
+from llm_providers import StubProvider
+
+TITLES = ["coffee", "uber ride", "groceries", "netflix", "petrol", "electricity bill",
+          "lunch", "movie", "gift", "mystery purchase", "hardware store", "weekend stuff"]
+
+
+def make_ndjson(rows: int) -> bytes:
+    rng = random.Random(42)
+    lines = []
+    for i in range(rows):
+        lines.append(json.dumps({
+            "title": f"{rng.choice(TITLES)} {i % 500}",
+            "amount": round(rng.uniform(10, 5000), 2),
+            "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T19:00:00",
+        }))
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def run(args):
+    set_llm_client(LLMClient(provider=StubProvider(latency=f"fixed:{args.latency}", seed=0)))
+    database.set_db(database.get_client()[args.database])
+    await database.get_client().drop_database(args.database)
+
+    body = make_ndjson(args.rows)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        response = await client.post("/expenses/bulk", content=body,
+                                     headers={"content-type": "application/x-ndjson"})
+        elapsed = time.perf_counter() - start
+    report = response.json()
+    print(f"bulk: {report['inserted']} rows in {elapsed:.2f}s "
+          f"({report['inserted'] / elapsed:,.0f} rows/s), {report['failed']} failed")
+
+    if args.compare_single:
+        sample = [json.loads(line) for line in body.decode().splitlines()[:args.compare_single]]
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            start = time.perf_counter()
+            for row in sample:
+                await client.post("/add_expense", json=row)
+            elapsed = time.perf_counter() - start
+        print(f"add_expense: {len(sample)} rows in {elapsed:.2f}s ({len(sample) / elapsed:,.0f} rows/s)")
+
+    await database.get_client().drop_database(args.database)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.5, help="stubbed model latency in seconds")
+    parser.add_argument("--database", default="expense_tracker_bench")
+    parser.add_argument("--compare-single", type=int, default=0,
+                        help="also time this many rows through POST /add_expense")
+    asyncio.run(run(parser.parse_args()))
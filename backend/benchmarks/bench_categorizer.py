@@ -0,0 +1,48 @@
+"""Microbenchmark: indexed local categorizer vs. the chain of any() scans.
+
+Run from the repository root:
+    python backend/benchmarks/bench_categorizer.py
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from categorizer import classify, CATEGORY_KEYWORDS, LOCAL_CATEGORY_MIN_CONFIDENCE
+
+TITLES = [
+    "coffee", "Coffee ", "uber ride", "netflix", "petrol", "electricity bill",
+    "groceries at supermarket", "movie tickets", "doctor visit", "college fees",
+    "new shoes from amazon", "spotify premium", "gas", "birthday gift for mom",
+    "flight to goa", "haircut", "random thing", "dinner with friends",
+    "metro card recharge", "pharmacy medicines",
+]
+
+
+def any_chain(title: str) -> str:
+    """The original categorizer: first category with a keyword contained in the title"""
+    title_lower = title.lower()
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(word in title_lower for word in keywords):
+            return category
+    return "Other"
+
+
+def main(args):
+    results = [classify(title) for title in TITLES]
+    hits = sum(1 for category, confidence in results
+               if category != "Other" and confidence >= LOCAL_CATEGORY_MIN_CONFIDENCE)
+    print(f"confident local matches: {hits}/{len(TITLES)} titles")
+
+    for label, fn in (("any() chain", any_chain), ("token index", classify)):
+        elapsed = timeit.timeit(lambda: [fn(title) for title in TITLES], number=args.rounds)
+        per_call = elapsed / (args.rounds * len(TITLES)) * 1e6
+        print(f"{label:>12}: {per_call:6.2f} us/title")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,81 @@
+"""End-to-end dashboard load: six separate requests vs. GET /dashboard.
+
+The response cache is disabled so every load reaches MongoDB. Besides
+latency, the MongoDB opcounters (from serverStatus) are sampled around
+each run to show how many server operations one dashboard load costs.
+Reads the database configured by MONGODB_URI; seed it first for
+meaningful numbers.
+
+Run from the repository root:
+    python backend/benchmarks/bench_dashboard.py --loads 100
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx
+
+import main
+import database
+from tenancy import DEFAULT_USER_ID
+from response_cache import response_cache
+
+LEGACY_ENDPOINTS = ["/today_expenses", "/summary", "/category_summary",
+                    "/monthly_trends", "/weekly_trends", "/top_categories"]
+
+
+async def legacy_load(client):
+    responses = await asyncio.gather(*(client.get(path) for path in LEGACY_ENDPOINTS))
+    for response in responses:
+        response.raise_for_status()
+
+
+async def dashboard_load(client):
+    response = await client.get("/dashboard")
+    response.raise_for_status()
+
+
+async def opcount():
+    status = await database.get_client().admin.command("serverStatus")
+    return sum(status["opcounters"].values())
+
+
+async def measure(client, load, loads: int):
+    samples = []
+    ops_before = await opcount()
+    started = time.perf_counter()
+    for _ in range(loads):
+        start = time.perf_counter()
+        await load(client)
+        samples.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - started
+    # serverStatus itself is counted once per sample
+    ops = await opcount() - ops_before - 1
+    return statistics.median(samples), ops / loads, ops / elapsed
+
+
+async def run(args):
+    response_cache.backend = None
+    if args.database:
+        database.set_db(database.get_client()[args.database])
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None,
+                                 headers={"X-User-Id": args.user_id}) as client:
+        print(f"{'mode':>12} {'p50':>10} {'ops/load':>10} {'ops/sec':>10}")
+        for label, load in (("6 requests", legacy_load), ("/dashboard", dashboard_load)):
+            await load(client)
+            p50, ops_per_load, ops_per_sec = await measure(client, load, args.loads)
+            print(f"{label:>12} {p50:8.2f}ms {ops_per_load:10.1f} {ops_per_sec:10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loads", type=int, default=100)
+    parser.add_argument("--database", help="database name to read instead of expense_tracker")
+    parser.add_argument("--user-id", default=DEFAULT_USER_ID, help="tenant whose expenses are read")
+    asyncio.run(run(parser.parse_args()))
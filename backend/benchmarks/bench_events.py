@@ -0,0 +1,79 @@
+"""Fan-out cost of live dashboard deltas vs. refetching after each write.
+
+Connects --clients in-process SSE subscribers to the event broker and
+publishes --writes single-expense deltas, --interval seconds apart.
+Reports the publish cost per write and the end-to-end delivery latency,
+next to the number of requests (and aggregations) the old
+refetch-six-endpoints approach would have made.
+No database is needed.
+
+Run from the repository root:
+    python backend/benchmarks/bench_events.py --clients 1000 --writes 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bson import ObjectId
+
+from events import EventBroker
+
+REFETCH_REQUESTS_PER_WRITE = 6
+# Every client watches the same user's dashboard
+BENCH_USER_ID = "bench"
+
+
+async def client(broker: EventBroker, expected: int, ready: asyncio.Event, latencies: list, sent_at: dict):
+    stream = broker.stream(BENCH_USER_ID, heartbeat_seconds=3600)
+    await stream.__anext__()
+    ready.set()
+    received = 0
+    try:
+        while received < expected:
+            frame = await stream.__anext__()
+            if frame.startswith("event: expenses"):
+                received += 1
+                latencies.append((time.perf_counter() - sent_at[received]) * 1000)
+    finally:
+        await stream.aclose()
+
+
+async def run(args):
+    broker = EventBroker(source="local", queue_size=args.writes + 1)
+    latencies = []
+    sent_at = {}
+    ready_events = [asyncio.Event() for _ in range(args.clients)]
+    tasks = [asyncio.create_task(client(broker, args.writes, ready, latencies, sent_at))
+             for ready in ready_events]
+    await asyncio.gather(*(ready.wait() for ready in ready_events))
+
+    publish_times = []
+    for index in range(1, args.writes + 1):
+        doc = {"_id": ObjectId(), "user_id": BENCH_USER_ID, "title": "coffee", "amount": 120.0,
+               "date": datetime.now(timezone.utc), "category": "Food & Dining"}
+        sent_at[index] = time.perf_counter()
+        broker.expenses_added([doc])
+        publish_times.append((time.perf_counter() - sent_at[index]) * 1000)
+        await asyncio.sleep(args.interval)
+    await asyncio.gather(*tasks)
+
+    print(f"clients={args.clients} writes={args.writes}")
+    print(f"publish per write: p50={statistics.median(publish_times):.3f}ms max={max(publish_times):.3f}ms")
+    print(f"delivery latency:  p50={statistics.median(latencies):.2f}ms "
+          f"p99={sorted(latencies)[int(len(latencies) * 0.99) - 1]:.2f}ms")
+    print(f"database reads: 0 with deltas vs {args.clients * args.writes * REFETCH_REQUESTS_PER_WRITE:,} "
+          f"requests if every client refetched {REFETCH_REQUESTS_PER_WRITE} endpoints per write")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between writes")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,111 @@
+"""Offline ingestion load test: virtual users parse and save expenses.
+
+The model is replaced by the seeded StubProvider, so runs are repeatable
+and need no API key. Each virtual user loops over POST /parse_expense and,
+when parsing succeeds, POST /add_expense with the result. Expenses are
+written to the database configured by MONGODB_URI, so point it at a
+local mongod.
+
+Run from the repository root:
+    python backend/benchmarks/bench_ingestion.py --users 50 --duration 20 \\
+        --latency lognormal:-0.7:0.5 --error-rate 0.02 --malformed-rate 0.01
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# The local parser and categorizer would answer these messages without the
+# model; confidence never exceeds 1, so every request reaches the stub
+os.environ["LOCAL_PARSE_MIN_CONFIDENCE"] = "1.1"
+os.environ["LOCAL_CATEGORY_MIN_CONFIDENCE"] = "1.1"
+
+import httpx
+
+import main
+import database
+from llm_client import LLMClient, get_llm_client, set_llm_client, LLM_MAX_CONCURRENCY, LLM_MAX_PENDING
+from llm_providers import StubProvider
+
+from _util import percentile
+
+MESSAGES = [
+    "spent 120 on coffee",
+    "paid 450 for uber to office",
+    "1200 groceries at bigbasket",
+    "netflix subscription 649",
+    "electricity bill 2300",
+    "lunch with team 860",
+    "movie tickets 500",
+    "pharmacy medicines 340",
+    "flight to delhi 5400",
+    "gym membership 1500",
+]
+
+
+async def virtual_user(client, rng: random.Random, deadline: float, latencies: list, counts: dict):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.post("/parse_expense", json={"message": rng.choice(MESSAGES)})
+        status = f"parse {response.status_code}"
+        if response.status_code == 200:
+            response = await client.post("/add_expense", json=response.json())
+            status = f"add {response.status_code}"
+        counts[status] = counts.get(status, 0) + 1
+        if response.status_code == 200:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run(args):
+    provider = StubProvider(latency=args.latency, error_rate=args.error_rate,
+                            malformed_rate=args.malformed_rate, seed=args.seed)
+    set_llm_client(LLMClient(provider=provider, max_concurrency=args.max_concurrency,
+                             max_pending=args.max_pending, hedge=args.hedge))
+    if args.database:
+        database.set_db(database.get_client()[args.database])
+
+    latencies = []
+    counts = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            virtual_user(client, random.Random(args.seed + index), deadline, latencies, counts)
+            for index in range(args.users)
+        ))
+        elapsed = time.perf_counter() - started
+
+    print(f"users={args.users} duration={elapsed:.1f}s latency={args.latency} "
+          f"error_rate={args.error_rate} malformed_rate={args.malformed_rate} seed={args.seed}")
+    if latencies:
+        print(f"saved {len(latencies)} expenses, {len(latencies) / elapsed:.1f}/s; "
+              f"p50={statistics.median(latencies):.1f}ms "
+              f"p95={percentile(latencies, 95):.1f}ms "
+              f"p99={percentile(latencies, 99):.1f}ms")
+    print(f"status counts: {dict(sorted(counts.items()))}")
+    stats = get_llm_client().stats
+    print(f"breaker: {stats['breaker']}")
+    print(f"hedge: {stats['hedge']}")
+    print(f"fallbacks: {stats['fallbacks']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--latency", default="lognormal:-0.7:0.5",
+                        help="stub latency: fixed:S, uniform:LO:HI or lognormal:MU:SIGMA (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-concurrency", type=int, default=LLM_MAX_CONCURRENCY)
+    parser.add_argument("--max-pending", type=int, default=LLM_MAX_PENDING)
+    parser.add_argument("--hedge", action="store_true", help="hedge calls slower than the recent p95")
+    parser.add_argument("--database", help="database name to write instead of expense_tracker")
+    asyncio.run(run(parser.parse_args()))
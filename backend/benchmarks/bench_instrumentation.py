@@ -0,0 +1,82 @@
+"""Overhead of the request instrumentation in profiling.py and metrics.py.
+
+Times the primitives every request pays for (a histogram observation, a
+stage() block, a Server-Timing header) and one full pass through
+ProfilingMiddleware around a no-op ASGI app, then renders /metrics with
+--routes routes worth of series. No database is needed.
+
+Run from the repository root:
+    python backend/benchmarks/bench_instrumentation.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import metrics
+from profiling import ProfilingMiddleware, RequestTimings, stage
+
+SCOPE = {"type": "http", "method": "GET", "path": "/summary", "headers": []}
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def discard(message):
+    pass
+
+
+def per_call_us(statement, number: int) -> float:
+    return timeit.timeit(statement, number=number) / number * 1e6
+
+
+def run_stage():
+    with stage("bench"):
+        pass
+
+
+def server_timing():
+    timings = RequestTimings()
+    timings.add("llm", 0.4)
+    timings.add("mongo", 0.006)
+    timings.server_timing(time.perf_counter())
+
+
+async def middleware_us(number: int) -> float:
+    plain, wrapped = noop_app, ProfilingMiddleware(noop_app)
+    results = {}
+    for label, app in (("plain", plain), ("wrapped", wrapped)):
+        started = time.perf_counter()
+        for _ in range(number):
+            await app(dict(SCOPE), None, discard)
+        results[label] = (time.perf_counter() - started) / number * 1e6
+    return results["wrapped"] - results["plain"]
+
+
+def main(args):
+    print(f"{'metrics.observe':>22}: {per_call_us(lambda: metrics.observe('bench', 0.012, stage='x'), args.number):6.2f}us")
+    print(f"{'stage() block':>22}: {per_call_us(run_stage, args.number):6.2f}us")
+    print(f"{'Server-Timing header':>22}: {per_call_us(server_timing, args.number):6.2f}us")
+    print(f"{'middleware per request':>22}: {asyncio.run(middleware_us(args.number)):6.2f}us")
+
+    metrics.reset()
+    for route in range(args.routes):
+        for status in ("200", "404", "500"):
+            metrics.observe("http_request_duration_seconds", 0.01, method="GET", route=f"/r{route}", status=status)
+    started = time.perf_counter()
+    body = metrics.render_prometheus()
+    print(f"{'render /metrics':>22}: {(time.perf_counter() - started) * 1000:6.2f}ms "
+          f"for {args.routes * 3} series ({len(body) / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=100000)
+    parser.add_argument("--routes", type=int, default=40)
+    main(parser.parse_args())
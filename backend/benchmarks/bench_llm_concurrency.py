@@ -0,0 +1,103 @@
+"""Load benchmark: /summary latency while /parse_expense is saturated.
+
+Gemini is replaced by a stub with injected latency, so no API key is needed.
+/summary still talks to MongoDB, so point MONGODB_URI at a local mongod.
+
+Run from the repository root:
+    python backend/benchmarks/bench_llm_concurrency.py --latency 2.0 --parse-clients 64
+
+Pass --blocking to emulate the old behaviour where the model call blocked
+the event loop.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# The local parser and categorizer would answer these messages without the
+# model; confidence never exceeds 1, so every request reaches the stub
+os.environ["LOCAL_PARSE_MIN_CONFIDENCE"] = "1.1"
+os.environ["LOCAL_CATEGORY_MIN_CONFIDENCE"] = "1.1"
+
+import httpx
+
+import main
+from llm_client import LLMClient, set_llm_client, LLM_MAX_CONCURRENCY, LLM_MAX_PENDING
+from llm_providers import StubProvider
+
+from _util import percentile
+
+
+class BlockingStubProvider(StubProvider):
+    """Sleeps without yielding, like the old synchronous SDK call"""
+
+    def __init__(self, latency: float):
+        super().__init__(latency="fixed:0", seed=0)
+        self.latency = latency
+
+    async def generate(self, prompt: str, response_schema: dict = None) -> str:
+        time.sleep(self.latency)
+        return await super().generate(prompt, response_schema)
+
+
+def make_provider(latency: float, blocking: bool):
+    if blocking:
+        return BlockingStubProvider(latency)
+    return StubProvider(latency=f"fixed:{latency}", seed=0)
+
+
+async def probe_summary(client, duration: float, interval: float):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/summary")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def hammer_parse(client, stop: asyncio.Event, counts: dict):
+    while not stop.is_set():
+        response = await client.post("/parse_expense", json={"message": "spent 120 on coffee"})
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+
+async def run(args):
+    set_llm_client(LLMClient(provider=make_provider(args.latency, args.blocking),
+                             max_concurrency=args.max_concurrency,
+                             max_pending=args.max_pending))
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        idle = await probe_summary(client, args.duration, args.interval)
+
+        stop = asyncio.Event()
+        counts = {}
+        workers = [asyncio.create_task(hammer_parse(client, stop, counts))
+                   for _ in range(args.parse_clients)]
+        loaded = await probe_summary(client, args.duration, args.interval)
+        stop.set()
+        await asyncio.gather(*workers)
+
+    for label, samples in (("idle", idle), ("parse saturated", loaded)):
+        print(f"/summary {label:>16}: n={len(samples):4d} "
+              f"p50={statistics.median(samples):8.2f}ms "
+              f"p99={percentile(samples, 99):8.2f}ms")
+    print(f"/parse_expense status counts: {counts}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=1.0, help="stubbed model latency in seconds")
+    parser.add_argument("--parse-clients", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--max-concurrency", type=int, default=LLM_MAX_CONCURRENCY)
+    parser.add_argument("--max-pending", type=int, default=LLM_MAX_PENDING)
+    parser.add_argument("--blocking", action="store_true", help="block the event loop like the old sync client")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,105 @@
+"""Parse accuracy and throughput: rule-based parser vs. the model path.
+
+Scores both parsers against the labelled corpus in parse_corpus.jsonl
+(amount, date and title per message, dated relative to a fixed reference
+time) and reports messages/sec. The model path uses the provider named by
+--provider; with the default stub its answers come from the same rules, so
+only its throughput is meaningful. Use --provider gemini with an API key
+to measure real model accuracy.
+
+Run from the repository root:
+    python backend/benchmarks/bench_parser.py --latency fixed:0.4
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import timeit
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gemini_utils import _build_parse_prompt, _parse_response_json
+from llm_client import LLMClient, LLMError
+from llm_providers import StubProvider, get_provider
+from local_parser import parse_message, LOCAL_PARSE_MIN_CONFIDENCE
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parse_corpus.jsonl")
+REFERENCE_NOW = datetime(2024, 10, 16, 10, 0, tzinfo=timezone.utc)
+
+
+def load_corpus(path: str):
+    with open(path, encoding="utf-8") as corpus:
+        return [json.loads(line) for line in corpus if line.strip()]
+
+
+def score(expected: dict, parsed: dict) -> dict:
+    if parsed is None:
+        return {"amount": False, "date": False, "title": False}
+    return {
+        "amount": abs(float(parsed["amount"]) - expected["amount"]) < 0.005,
+        "date": str(parsed["date"])[:10] == expected["date"],
+        "title": parsed["title"].strip().lower() == expected["title"].lower(),
+    }
+
+
+def report(label: str, results):
+    total = len(results)
+    if not total:
+        print(f"{label:>22}: no messages")
+        return
+    fields = {field: sum(result[field] for result in results) / total for field in ("amount", "date", "title")}
+    exact = sum(result["amount"] and result["date"] for result in results) / total
+    print(f"{label:>22}: n={total:3d} amount={fields['amount']:.0%} date={fields['date']:.0%} "
+          f"title={fields['title']:.0%} amount+date={exact:.0%}")
+
+
+async def parse_with_model(client: LLMClient, message: str):
+    try:
+        response_text = await client.generate(_build_parse_prompt(message, REFERENCE_NOW))
+        return _parse_response_json(response_text, REFERENCE_NOW)
+    except (LLMError, ValueError):
+        return None
+
+
+async def run(args):
+    corpus = load_corpus(args.corpus)
+    messages = [row["message"] for row in corpus]
+
+    local = [parse_message(message, REFERENCE_NOW) for message in messages]
+    local_results = [score(row, parsed) for row, (parsed, _) in zip(corpus, local)]
+    confident = [result for result, (_, confidence) in zip(local_results, local)
+                 if confidence >= LOCAL_PARSE_MIN_CONFIDENCE]
+    report("rules, all", local_results)
+    report(f"rules, conf >= {LOCAL_PARSE_MIN_CONFIDENCE}", confident)
+    print(f"{'coverage':>22}: {len(confident) / len(corpus):.0%} of messages skip the model")
+
+    elapsed = timeit.timeit(lambda: [parse_message(message, REFERENCE_NOW) for message in messages],
+                            number=args.rounds)
+    print(f"{'rules throughput':>22}: {args.rounds * len(messages) / elapsed:,.0f} messages/sec")
+
+    provider = StubProvider(latency=args.latency, seed=0) if args.provider == "stub" else get_provider(args.provider)
+    client = LLMClient(provider=provider, max_pending=len(messages))
+    started = time.perf_counter()
+    model = await asyncio.gather(*(parse_with_model(client, message) for message in messages))
+    elapsed = time.perf_counter() - started
+    report(f"model ({provider.name})", [score(row, parsed) for row, parsed in zip(corpus, model)])
+    print(f"{'model throughput':>22}: {len(messages) / elapsed:,.1f} messages/sec "
+          f"(max_concurrency={client.max_concurrency})")
+
+    if args.verbose:
+        for row, (parsed, confidence), result in zip(corpus, local, local_results):
+            if not all(result.values()):
+                print(f"  {confidence:.2f} {row['message']!r} -> {parsed}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--provider", default="stub", choices=["stub", "gemini"])
+    parser.add_argument("--latency", default="fixed:0.4", help="stub latency, see StubProvider")
+    parser.add_argument("--verbose", action="store_true", help="print rule-based misses")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,64 @@
+"""Latency benchmark for the analytics response cache.
+
+Times each analytics endpoint with the cache disabled, with warm cache
+hits, and with conditional requests answered by 304. Reads the database
+configured by MONGODB_URI; seed it first (e.g. with bench_rollups.py --keep
+and --database expense_tracker, then --user-id bench) for meaningful numbers.
+
+Run from the repository root:
+    python backend/benchmarks/bench_response_cache.py --requests 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx
+
+import main
+import database
+from tenancy import DEFAULT_USER_ID
+from response_cache import response_cache, MemoryBackend
+
+ENDPOINTS = ["/summary", "/category_summary", "/top_categories", "/monthly_trends", "/weekly_trends"]
+
+
+async def time_requests(client, path: str, count: int, headers=None):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), response
+
+
+async def run(args):
+    if args.database:
+        database.set_db(database.get_client()[args.database])
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None,
+                                 headers={"X-User-Id": args.user_id}) as client:
+        print(f"{'endpoint':>18} {'uncached':>10} {'hit':>10} {'304':>10}")
+        for path in ENDPOINTS:
+            response_cache.backend = None
+            uncached, _ = await time_requests(client, path, args.requests)
+
+            response_cache.backend = MemoryBackend()
+            await client.get(path)
+            hit, response = await time_requests(client, path, args.requests)
+            not_modified, _ = await time_requests(client, path, args.requests,
+                                                  headers={"If-None-Match": response.headers["etag"]})
+            print(f"{path:>18} {uncached:8.2f}ms {hit:8.2f}ms {not_modified:8.2f}ms")
+    print(f"hit ratio: {response_cache.stats['hit_rate']:.2%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--database", help="database name to read instead of expense_tracker")
+    parser.add_argument("--user-id", default=DEFAULT_USER_ID, help="tenant whose expenses are read")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,130 @@
+"""Analytics benchmark: full-collection pipelines vs. rollup-backed reads.
+
+Seeds --rows synthetic expenses spread over --days days into a scratch
+database, builds the rollups, then times each analytics query both ways.
+Point MONGODB_URI at a disposable local mongod.
+
+Run from the repository root:
+    python backend/benchmarks/bench_rollups.py --rows 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import rollups
+from gemini_utils import EXPENSE_CATEGORIES
+
+# Every synthetic expense belongs to one user, so both sides read the same rows
+BENCH_USER_ID = "bench"
+
+
+def legacy_pipelines(now):
+    six_months_ago = now - timedelta(days=180)
+    four_weeks_ago = now - timedelta(days=28)
+    return {
+        "summary": [{"$group": {"_id": None, "total": {"$sum": "$amount"}}}],
+        "category_summary": [{"$group": {"_id": "$category", "total": {"$sum": "$amount"}, "count": {"$sum": 1}}}],
+        "top_categories": [
+            {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
+            {"$sort": {"total": -1}},
+            {"$limit": 5},
+        ],
+        "monthly_trends": [
+            {"$match": {"date": {"$gte": six_months_ago}}},
+            {"$group": {"_id": {"year": {"$year": "$date"}, "month": {"$month": "$date"}},
+                        "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+            {"$sort": {"_id.year": 1, "_id.month": 1}},
+        ],
+        "weekly_trends": [
+            {"$match": {"date": {"$gte": four_weeks_ago}}},
+            {"$group": {"_id": {"week": {"$week": "$date"}, "year": {"$year": "$date"}},
+                        "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+            {"$sort": {"_id.year": 1, "_id.week": 1}},
+        ],
+    }
+
+
+def rollup_pipelines(now):
+    return {
+        "summary": rollups.summary_pipeline(BENCH_USER_ID),
+        "category_summary": rollups.category_totals_pipeline(BENCH_USER_ID),
+        "top_categories": rollups.top_categories_pipeline(BENCH_USER_ID, 5),
+        "monthly_trends": rollups.monthly_trends_pipeline(BENCH_USER_ID, now - timedelta(days=180)),
+        "weekly_trends": rollups.weekly_trends_pipeline(BENCH_USER_ID, now - timedelta(days=28)),
+    }
+
+
+async def seed(db, rows: int, days: int):
+    rng = random.Random(7)
+    now = datetime.now(timezone.utc)
+    batch = []
+    for _ in range(rows):
+        batch.append({
+            "user_id": BENCH_USER_ID,
+            "title": "synthetic",
+            "amount": round(rng.uniform(10, 5000), 2),
+            "date": now - timedelta(seconds=rng.randint(0, days * 86400)),
+            "category": rng.choice(EXPENSE_CATEGORIES),
+        })
+        if len(batch) == 10000:
+            await db.expenses.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.expenses.insert_many(batch, ordered=False)
+
+
+async def time_pipeline(collection, pipeline, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await collection.aggregate(pipeline).to_list(length=None)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def run(args):
+    load_dotenv("backend/.env")
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    db = client[args.database]
+    await client.drop_database(args.database)
+
+    start = time.perf_counter()
+    await seed(db, args.rows, args.days)
+    print(f"seeded {args.rows:,} expenses in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    await rollups.ensure_indexes(db.expense_rollups)
+    await rollups.rebuild(db.expenses, db.expense_rollups)
+    print(f"built {await db.expense_rollups.count_documents({}):,} rollups "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    now = datetime.now(timezone.utc)
+    legacy, rolled = legacy_pipelines(now), rollup_pipelines(now)
+    print(f"{'endpoint':>18} {'expenses':>12} {'rollups':>12}")
+    for name in legacy:
+        before = await time_pipeline(db.expenses, legacy[name], args.repeats)
+        after = await time_pipeline(db.expense_rollups, rolled[name], args.repeats)
+        print(f"{name:>18} {before:10.1f}ms {after:10.1f}ms")
+
+    if not args.keep:
+        await client.drop_database(args.database)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--database", default="expense_tracker_bench")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,93 @@
+"""Cold-start cost of a fresh API worker.
+
+Starts --repeats fresh interpreters and, in each, times `import main` and
+the app lifespan startup (client construction, Mongo ping, migrations,
+workers), plus the wall time of the whole process. A separate
+`python -X importtime` run breaks the import down by the modules main pulls
+in, sorted by cumulative time. The lifespan step talks to the database
+configured by MONGODB_URI; pass --import-only to skip it.
+
+Run from the repository root:
+    python backend/benchmarks/bench_startup.py --repeats 10
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+CHILD = """
+import asyncio, time
+started = time.perf_counter()
+import {module} as target
+imported = time.perf_counter()
+
+async def start():
+    async with target.app.router.lifespan_context(target.app):
+        return time.perf_counter()
+
+ready = asyncio.run(start()) if {lifespan} else imported
+print((imported - started) * 1000, (ready - imported) * 1000)
+"""
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$")
+
+
+def run_child(args, env):
+    code = CHILD.format(module=args.module, lifespan=not args.import_only)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, env=env,
+                            capture_output=True, text=True, check=True)
+    wall = (time.perf_counter() - started) * 1000
+    import_ms, lifespan_ms = (float(value) for value in result.stdout.split()[-2:])
+    return import_ms, lifespan_ms, wall
+
+
+def import_breakdown(args, env):
+    """Cumulative import time (ms) of the target and of each module it imports directly"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {args.module}"],
+                            cwd=BACKEND, env=env, capture_output=True, text=True, check=True)
+    total = 0.0
+    children = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        if len(indent) == 1 and name == args.module:
+            total = int(cumulative) / 1000
+        elif len(indent) == 3:
+            children.append((int(cumulative) / 1000, name))
+    return total, sorted(children, reverse=True)
+
+
+def main(args):
+    env = dict(os.environ, LLM_PROVIDER=args.provider)
+    # The first run may compile bytecode; it is not a cold start we care about
+    run_child(args, env)
+    runs = [run_child(args, env) for _ in range(args.repeats)]
+    print(f"{args.repeats} fresh interpreters, LLM_PROVIDER={args.provider}")
+    for label, values in zip(("import", "lifespan startup", "process wall"), zip(*runs)):
+        if label == "lifespan startup" and args.import_only:
+            continue
+        print(f"{label:>18}: p50={statistics.median(values):8.1f}ms  min={min(values):8.1f}ms")
+
+    total, children = import_breakdown(args, env)
+    print(f"\n-X importtime: import {args.module} {total:.1f}ms cumulative; heaviest direct imports:")
+    for cumulative, name in children[:args.top]:
+        print(f"  {cumulative:8.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--provider", default="stub", choices=["stub", "gemini"],
+                        help="gemini includes the google-generativeai import in the warmup")
+    parser.add_argument("--import-only", action="store_true", help="skip the lifespan startup")
+    parser.add_argument("--top", type=int, default=12)
+    main(parser.parse_args())
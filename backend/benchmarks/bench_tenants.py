@@ -0,0 +1,153 @@
+"""Per-tenant read cost with many users sharing one database.
+
+Seeds --tenants users with --expenses-per-tenant synthetic expenses each
+into a scratch database, builds the indexes and rollups, then times
+/dashboard, /all_expenses and /summary as randomly chosen tenants with the
+response cache disabled. Each query is also explained to show that keys
+and documents examined track one user's history, not the collection size.
+Point MONGODB_URI at a disposable local mongod.
+
+Run from the repository root:
+    python backend/benchmarks/bench_tenants.py --tenants 10000 --expenses-per-tenant 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx
+
+import main
+import database
+import indexes
+import rollups
+from gemini_utils import EXPENSE_CATEGORIES
+from pagination import DEFAULT_PAGE_SIZE
+from response_cache import response_cache
+
+ENDPOINTS = ["/dashboard", "/all_expenses", "/summary"]
+
+
+def tenant_id(index: int) -> str:
+    return f"tenant-{index:06d}"
+
+
+async def seed(db, tenants: int, per_tenant: int, days: int):
+    rng = random.Random(7)
+    now = datetime.now(timezone.utc)
+    batch = []
+    for tenant in range(tenants):
+        user_id = tenant_id(tenant)
+        for _ in range(per_tenant):
+            batch.append({
+                "user_id": user_id,
+                "title": "synthetic",
+                "amount": round(rng.uniform(10, 5000), 2),
+                "date": now - timedelta(seconds=rng.randint(0, days * 86400)),
+                "category": rng.choice(EXPENSE_CATEGORIES),
+            })
+            if len(batch) == 10000:
+                await db.expenses.insert_many(batch, ordered=False)
+                batch = []
+    if batch:
+        await db.expenses.insert_many(batch, ordered=False)
+
+
+async def time_endpoint(client, path: str, tenants: int, requests: int, rng):
+    samples = []
+    for _ in range(requests):
+        headers = {"X-User-Id": tenant_id(rng.randrange(tenants))}
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def _execution_stats(explain, found=None):
+    """Sum totalKeysExamined/totalDocsExamined over every executionStats in an explain"""
+    found = {"keys": 0, "docs": 0} if found is None else found
+    if isinstance(explain, dict):
+        stats = explain.get("executionStats")
+        if isinstance(stats, dict):
+            found["keys"] += stats.get("totalKeysExamined", 0)
+            found["docs"] += stats.get("totalDocsExamined", 0)
+        for key, value in explain.items():
+            if key != "executionStats":
+                _execution_stats(value, found)
+    elif isinstance(explain, list):
+        for value in explain:
+            _execution_stats(value, found)
+    return found
+
+
+def explain_commands(user_id: str, page_size: int):
+    """(label, explain command) for the scoped queries and an unscoped baseline"""
+    return [
+        ("all_expenses page", {
+            "find": "expenses", "filter": {"user_id": user_id},
+            "sort": {"date": -1, "_id": -1}, "limit": page_size,
+        }),
+        ("summary (rollups)", {
+            "aggregate": "expense_rollups", "pipeline": rollups.summary_pipeline(user_id), "cursor": {},
+        }),
+        ("summary (unscoped)", {
+            "aggregate": "expense_rollups", "pipeline": rollups.summary_pipeline(None), "cursor": {},
+        }),
+    ]
+
+
+async def run(args):
+    response_cache.backend = None
+    client = database.get_client()
+    db = client[args.database]
+    database.set_db(db)
+    await client.drop_database(args.database)
+
+    start = time.perf_counter()
+    await seed(db, args.tenants, args.expenses_per_tenant, args.days)
+    print(f"seeded {args.tenants:,} tenants x {args.expenses_per_tenant:,} expenses "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    await indexes.ensure_indexes(db)
+    await rollups.rebuild(db.expenses, db.expense_rollups)
+    print(f"built indexes and {await db.expense_rollups.count_documents({}):,} rollups "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(11)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        print(f"{'endpoint':>14} {'p50':>10} {'p99':>10}")
+        for path in ENDPOINTS:
+            await http.get(path)
+            p50, p99 = await time_endpoint(http, path, args.tenants, args.requests, rng)
+            print(f"{path:>14} {p50:8.2f}ms {p99:8.2f}ms")
+
+    user_id = tenant_id(rng.randrange(args.tenants))
+    print(f"\n{'query':>20} {'keys':>10} {'docs':>10}")
+    for label, command in explain_commands(user_id, DEFAULT_PAGE_SIZE):
+        explain = await db.command("explain", command, verbosity="executionStats")
+        stats = _execution_stats(explain)
+        print(f"{label:>20} {stats['keys']:10,} {stats['docs']:10,}")
+
+    if not args.keep:
+        await client.drop_database(args.database)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=10_000)
+    parser.add_argument("--expenses-per-tenant", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--database", default="expense_tracker_bench_tenants")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,144 @@
+import csv
+import json
+import os
+import logging
+from datetime import datetime, timezone
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from models import Expense
+from gemini_utils import categorize_titles_async
+
+logger = logging.getLogger(__name__)
+
+# Rows validated, categorized and written per insert_many call
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+
+async def _iter_lines(stream):
+    """Yield decoded lines from an async byte stream without buffering the whole body"""
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+
+async def iter_ndjson_rows(stream):
+    async for line in _iter_lines(stream):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ValueError(f"Invalid JSON: {e}")
+
+
+async def iter_csv_rows(stream):
+    header = None
+    async for line in _iter_lines(stream):
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        yield dict(zip(header, values))
+
+
+async def iter_json_rows(rows):
+    for row in rows:
+        yield row
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+
+def validate_row(row, user_id: str) -> dict:
+    """Validate one raw row through the Expense model and return `user_id`'s document.
+
+    Any user_id in the row itself is ignored. Raises ValueError with a
+    readable message when the row is invalid.
+    """
+    if isinstance(row, Exception):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    try:
+        expense = Expense(**row)
+    except ValidationError as e:
+        raise ValueError(_format_validation_error(e))
+
+    parsed_date = expense.date or datetime.now(timezone.utc)
+    if parsed_date.tzinfo is None:
+        parsed_date = parsed_date.replace(tzinfo=timezone.utc)
+    return {
+        "user_id": user_id,
+        "title": expense.title,
+        "amount": expense.amount,
+        "date": parsed_date,
+        "category": expense.category,
+    }
+
+
+async def _flush(collection, chunk, errors, user_id: str) -> list:
+    """Categorize and insert one chunk of (row_number, doc) pairs; return inserted docs"""
+    uncategorized = [doc for _, doc in chunk if doc["category"] == "Other"]
+    if uncategorized:
+        categories = await categorize_titles_async([doc["title"] for doc in uncategorized], user_id)
+        for doc, category in zip(uncategorized, categories):
+            doc["category"] = category
+
+    docs = [doc for _, doc in chunk]
+    try:
+        await collection.insert_many(docs, ordered=False)
+        return docs
+    except BulkWriteError as e:
+        failed = set()
+        for write_error in e.details.get("writeErrors", []):
+            failed.add(write_error["index"])
+            errors.append({"row": chunk[write_error["index"]][0], "error": write_error.get("errmsg", "write failed")})
+        return [doc for index, (_, doc) in enumerate(chunk) if index not in failed]
+
+
+async def _flush_and_notify(collection, chunk, errors, user_id: str, on_inserted) -> int:
+    docs = await _flush(collection, chunk, errors, user_id)
+    if docs and on_inserted is not None:
+        await on_inserted(docs)
+    return len(docs)
+
+
+async def import_rows(collection, rows, user_id: str, on_inserted=None) -> dict:
+    """Validate, categorize and persist an async iterable of raw rows in chunks for `user_id`.
+
+    `on_inserted`, if given, is awaited with each chunk's inserted documents.
+    Returns a report with inserted/failed counts and per-row errors (1-based rows).
+    """
+    errors = []
+    inserted = 0
+    chunk = []
+    row_number = 0
+
+    async for row in rows:
+        row_number += 1
+        try:
+            chunk.append((row_number, validate_row(row, user_id)))
+        except ValueError as e:
+            errors.append({"row": row_number, "error": str(e)})
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            inserted += await _flush_and_notify(collection, chunk, errors, user_id, on_inserted)
+            chunk = []
+
+    if chunk:
+        inserted += await _flush_and_notify(collection, chunk, errors, user_id, on_inserted)
+
+    errors.sort(key=lambda error: error["row"])
+    logger.info(f"Bulk import finished: {inserted} inserted, {len(errors)} failed")
+    return {"received": row_number, "inserted": inserted, "failed": len(errors), "errors": errors}
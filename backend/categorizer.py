@@ -0,0 +1,103 @@
+import os
+import re
+from collections import defaultdict
+
+import metrics
+
+# Keyword lists per category; earlier categories win ties in keyword_category()
+CATEGORY_KEYWORDS = {
+    "Food & Dining": ['food', 'restaurant', 'cafe', 'coffee', 'lunch', 'dinner', 'breakfast',
+                      'pizza', 'burger', 'swiggy', 'zomato', 'snacks', 'tea'],
+    "Transportation": ['uber', 'taxi', 'bus', 'train', 'metro', 'transport', 'ola', 'cab', 'auto',
+                       'parking', 'toll'],
+    "Groceries": ['grocery', 'supermarket', 'vegetables', 'fruits', 'milk', 'bigbasket', 'blinkit'],
+    "Fuel": ['petrol', 'diesel', 'fuel', 'gas'],
+    "Entertainment": ['movie', 'cinema', 'game', 'entertainment', 'concert'],
+    "Bills & Utilities": ['electricity', 'water', 'gas', 'internet', 'phone', 'bill', 'recharge',
+                          'broadband', 'wifi'],
+    "Healthcare": ['medicine', 'doctor', 'hospital', 'health', 'pharmacy', 'clinic'],
+    "Education": ['book', 'course', 'education', 'school', 'college', 'tuition'],
+    "Shopping": ['shop', 'shopping', 'clothes', 'dress', 'amazon', 'flipkart', 'shoes'],
+    "Subscriptions": ['netflix', 'spotify', 'subscription', 'prime', 'hotstar', 'youtube'],
+    "Travel": ['flight', 'hotel', 'airbnb', 'trip', 'vacation'],
+    "Personal Care": ['salon', 'haircut', 'spa', 'cosmetics'],
+    "Home & Garden": ['furniture', 'plants', 'rent', 'plumber'],
+    "Gifts & Donations": ['gift', 'donation', 'charity'],
+}
+
+# A local answer is trusted when its best category holds at least this share
+# of the total match score; anything less is left to the model.
+LOCAL_CATEGORY_MIN_CONFIDENCE = float(os.getenv("LOCAL_CATEGORY_MIN_CONFIDENCE", "0.75"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _build_index(category_keywords: dict) -> dict:
+    """Map each keyword to {category: weight}; shared keywords split their weight"""
+    owners = defaultdict(list)
+    for category, keywords in category_keywords.items():
+        for keyword in keywords:
+            owners[keyword].append(category)
+    return {
+        keyword: {category: 1.0 / len(categories) for category in categories}
+        for keyword, categories in owners.items()
+    }
+
+
+_TOKEN_INDEX = _build_index(CATEGORY_KEYWORDS)
+
+
+def _lookup(token: str):
+    weights = _TOKEN_INDEX.get(token)
+    if weights is None and len(token) > 3:
+        # Cheap plural handling: "groceries" -> "grocery", "movies" -> "movie"
+        if token.endswith("ies"):
+            weights = _TOKEN_INDEX.get(token[:-3] + "y") or _TOKEN_INDEX.get(token[:-1])
+        elif token.endswith("s"):
+            weights = _TOKEN_INDEX.get(token[:-1])
+    return weights
+
+
+def score_title(title: str) -> dict:
+    """Return {category: score} for every category matched by a token of `title`"""
+    scores = defaultdict(float)
+    for token in _TOKEN_RE.findall(title.lower()):
+        weights = _lookup(token)
+        if weights:
+            for category, weight in weights.items():
+                scores[category] += weight
+    return scores
+
+
+def classify(title: str):
+    """Return (category, confidence) for the best local match, or ("Other", 0.0)"""
+    scores = score_title(title)
+    if not scores:
+        return "Other", 0.0
+    category, best = max(scores.items(), key=lambda item: item[1])
+    return category, best / sum(scores.values())
+
+
+def categorize_locally(title: str):
+    """Return a category when the local index is confident, otherwise None.
+
+    Updates the categorizer.local_hit / categorizer.llm_fallback counters.
+    """
+    category, confidence = classify(title)
+    if confidence >= LOCAL_CATEGORY_MIN_CONFIDENCE and category != "Other":
+        metrics.incr("categorizer.local_hit")
+        return category
+    metrics.incr("categorizer.llm_fallback")
+    return None
+
+
+def keyword_category(title: str) -> str:
+    """Best whole-token keyword match, ties going to the earlier category; "Other" when none.
+
+    Matching whole tokens keeps short keywords such as 'tea' or 'spa' from
+    firing inside unrelated words ("steam", "spaghetti").
+    """
+    scores = score_title(title)
+    if not scores:
+        return "Other"
+    return max(CATEGORY_KEYWORDS, key=lambda category: scores.get(category, 0.0))
@@ -0,0 +1,222 @@
+import os
+import re
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_CACHE_MAX_SIZE = int(os.getenv("CATEGORY_CACHE_MAX_SIZE", "10000"))
+CATEGORY_CACHE_TTL_SECONDS = int(os.getenv("CATEGORY_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+# How long a user without a correction for a title is remembered in-process,
+# so corrections made through another worker show up within this time
+CATEGORY_CACHE_NO_OVERRIDE_TTL_SECONDS = int(os.getenv("CATEGORY_CACHE_NO_OVERRIDE_TTL_SECONDS", "60"))
+# Titles looked up in MongoDB per query by get_many
+CATEGORY_CACHE_LOOKUP_BATCH_SIZE = int(os.getenv("CATEGORY_CACHE_LOOKUP_BATCH_SIZE", "500"))
+
+# Cached in place of a user correction that does not exist
+_NO_OVERRIDE = ""
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_title(title: str) -> str:
+    """Cache key for a title: lowercase words joined by single spaces"""
+    return _NON_WORD_RE.sub(" ", title.lower()).strip()
+
+
+def _override_id(user_id: str, key: str) -> dict:
+    """MongoDB _id of a user's correction; shared answers use the bare title key"""
+    return {"user_id": user_id, "title": key}
+
+
+class LRUCache:
+    """Size-bounded in-process cache with per-entry expiry"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl_seconds: float = None):
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (value, time.monotonic() + ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class CategoryCache:
+    """Title -> category memo with an in-process LRU in front of a shared MongoDB tier.
+
+    Model and local answers are shared by every user. Corrections a user
+    makes are stored under (user_id, title) and only ever returned to that
+    user, ahead of the shared answer. The MongoDB tier is optional; until a
+    collection is attached the cache is purely in-process.
+    """
+
+    def __init__(self, max_size: int = CATEGORY_CACHE_MAX_SIZE, ttl_seconds: int = CATEGORY_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.local = LRUCache(max_size, ttl_seconds)
+        self.collection = None
+
+    def attach(self, collection):
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        if self.collection is not None:
+            # MongoDB removes documents once expires_at has passed
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, title: str, user_id: str = None):
+        """Cached category for `title`: `user_id`'s own correction if any, else the shared answer"""
+        found = await self.get_many([title], user_id)
+        return found.get(normalize_title(title))
+
+    async def get_many(self, titles, user_id: str = None) -> dict:
+        """Cached categories for many titles, keyed by normalized title; titles without one are left out.
+
+        Titles missing in-process are looked up in MongoDB with one query per
+        CATEGORY_CACHE_LOOKUP_BATCH_SIZE titles.
+        """
+        found = {}
+        # key -> (override, shared) still to look up; for the override None
+        # means unknown here and _NO_OVERRIDE means known not to exist
+        wanted = {}
+        for title in titles:
+            key = normalize_title(title)
+            if not key or key in found or key in wanted:
+                continue
+            override = self.local.get((user_id, key)) if user_id is not None else _NO_OVERRIDE
+            if override:
+                metrics.incr("category_cache.local_hit")
+                found[key] = override
+                continue
+            shared = self.local.get(key)
+            if shared is not None and override is not None:
+                metrics.incr("category_cache.local_hit")
+                found[key] = shared
+                continue
+            wanted[key] = (override, shared)
+
+        keys = list(wanted)
+        for i in range(0, len(keys), CATEGORY_CACHE_LOOKUP_BATCH_SIZE):
+            batch = keys[i:i + CATEGORY_CACHE_LOOKUP_BATCH_SIZE]
+            stored = await self._lookup(batch, wanted, user_id)
+            for key in batch:
+                override, shared = wanted[key]
+                if override is None:
+                    override = stored.get((True, key))
+                    if override:
+                        self.local.set((user_id, key), override)
+                        metrics.incr("category_cache.shared_hit")
+                        found[key] = override
+                        continue
+                    if self.collection is not None:
+                        self.local.set((user_id, key), _NO_OVERRIDE,
+                                       ttl_seconds=CATEGORY_CACHE_NO_OVERRIDE_TTL_SECONDS)
+                if shared is None and (False, key) in stored:
+                    self.local.set(key, stored[(False, key)])
+                    metrics.incr("category_cache.shared_hit")
+                    found[key] = stored[(False, key)]
+                elif shared is not None:
+                    metrics.incr("category_cache.local_hit")
+                    found[key] = shared
+                else:
+                    metrics.incr("category_cache.miss")
+        return found
+
+    async def _lookup(self, keys, wanted: dict, user_id: str) -> dict:
+        """Stored categories for `keys`, keyed by (is_override, key)"""
+        if self.collection is None:
+            return {}
+        ids = []
+        for key in keys:
+            override, shared = wanted[key]
+            if override is None:
+                ids.append(_override_id(user_id, key))
+            if shared is None:
+                ids.append(key)
+        try:
+            docs = await self.collection.find(
+                {"_id": {"$in": ids}, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                {"category": 1},
+            ).to_list(length=len(ids))
+        except Exception as e:
+            logger.warning(f"Category cache lookup failed: {e}")
+            return {}
+        stored = {}
+        for doc in docs:
+            if isinstance(doc["_id"], dict):
+                stored[(True, doc["_id"]["title"])] = doc["category"]
+            else:
+                stored[(False, doc["_id"])] = doc["category"]
+        return stored
+
+    def remember_local(self, title: str, category: str):
+        """Cache a cheaply derived category in-process only"""
+        key = normalize_title(title)
+        if key:
+            self.local.set(key, category)
+
+    async def set(self, title: str, category: str, source: str = "llm", user_id: str = None):
+        """Store a shared answer, or with `user_id` that user's own correction"""
+        key = normalize_title(title)
+        if not key:
+            return
+        if user_id is None:
+            local_key, doc_id = key, key
+        else:
+            local_key, doc_id = (user_id, key), _override_id(user_id, key)
+        self.local.set(local_key, category)
+        if self.collection is None:
+            return
+        now = datetime.now(timezone.utc)
+        try:
+            await self.collection.update_one(
+                {"_id": doc_id},
+                {"$set": {
+                    "category": category,
+                    "source": source,
+                    "updated_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                }},
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"Category cache write failed: {e}")
+
+    @property
+    def stats(self):
+        hits = metrics.get("category_cache.local_hit") + metrics.get("category_cache.shared_hit")
+        misses = metrics.get("category_cache.miss")
+        return {
+            "size": len(self.local),
+            "local_hits": metrics.get("category_cache.local_hit"),
+            "shared_hits": metrics.get("category_cache.shared_hit"),
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+
+category_cache = CategoryCache()
@@ -0,0 +1,80 @@
+import os
+import asyncio
+import logging
+
+from profiling import MongoCommandTimer
+
+logger = logging.getLogger(__name__)
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+MONGODB_DATABASE = os.getenv("MONGODB_DATABASE", "expense_tracker")
+# Pool bounds per process; keep the minimum small so short-lived workers start fast
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+_client = None
+_db = None
+
+
+def get_client():
+    """Return the shared Motor client, creating it on first use"""
+    global _client
+    if _client is None:
+        # Imported here so processes that never touch the database skip it
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        _client = AsyncIOMotorClient(
+            MONGODB_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=[MongoCommandTimer()],
+        )
+    return _client
+
+
+def get_db():
+    """Return the application database on the shared client"""
+    global _db
+    if _db is None:
+        _db = get_client()[MONGODB_DATABASE]
+    return _db
+
+
+def set_db(db):
+    """Replace the application database (used by benchmarks to point at scratch databases)"""
+    global _db
+    _db = db
+
+
+async def warmup():
+    """Open the first pooled connection so the first request does not pay for it"""
+    try:
+        await get_db().command("ping")
+    except Exception as e:
+        logger.warning(f"MongoDB warmup failed: {e}")
+
+
+def run_cli(main):
+    """Run a maintenance script's `main(db)` coroutine against the app database.
+
+    Loads backend/.env first, as main.py does for the app, so scripts reach
+    the same database wherever they are run from.
+    """
+    from dotenv import load_dotenv
+
+    global MONGODB_URI, MONGODB_DATABASE
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+    # Read at import, before .env was loaded
+    MONGODB_URI = os.getenv("MONGODB_URI")
+    MONGODB_DATABASE = os.getenv("MONGODB_DATABASE", "expense_tracker")
+    return asyncio.run(main(get_db()))
+
+
+def close():
+    global _client, _db
+    if _client is not None:
+        _client.close()
+    _client = None
+    _db = None
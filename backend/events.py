@@ -0,0 +1,216 @@
+"""Server-sent dashboard updates.
+
+Writes publish small deltas instead of making every open dashboard refetch
+six aggregations. Each client subscribes as one user and only receives
+events for that user's expenses. Event types, sent as SSE `event:` names:
+
+    expenses  {"expenses": [...], "today_expenses": [...], "total_delta": n,
+               "today_total_delta": n, "category_deltas": {category: {"total", "count"}},
+               "month_deltas": {"Oct 2024": {"total", "count"}},
+               "week_deltas": {"2024-41": {"total", "count"}}}
+    resync    {}  the client should refetch /dashboard (large import, lagging client)
+    cleared   {}  every expense of the user was deleted
+
+With EVENTS_SOURCE=local (default) each process publishes its own writes,
+which is enough for a single uvicorn worker: with several, a write and the
+writer's stream may land on different workers, and the dashboard then
+falls back to refetching. Multi-worker deployments should set
+EVENTS_SOURCE=change_stream, which publishes from a MongoDB change stream
+on the expenses collection so every worker sees every write; it needs a
+replica set. Deletions there
+carry no user_id, so they make every connected client resync.
+"""
+import os
+import json
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from collections import defaultdict
+
+import metrics
+from pagination import serialize_expense
+from rollups import day_bucket
+
+logger = logging.getLogger(__name__)
+
+EVENTS_SOURCE = os.getenv("EVENTS_SOURCE", "local").lower()
+# Frames buffered per client before it is told to resync instead
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+# Writes touching more expenses than this send a resync instead of a delta
+EVENTS_MAX_EXPENSES = int(os.getenv("EVENTS_MAX_EXPENSES", "100"))
+# Match the monthly and weekly trends windows of the dashboard
+MONTHLY_TRENDS_DAYS = 180
+WEEKLY_TRENDS_DAYS = 28
+
+RESYNC_FRAME = "event: resync\ndata: {}\n\n"
+
+
+def _frame(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def expense_delta(docs, now: datetime = None) -> dict:
+    """Dashboard delta for newly inserted expense documents"""
+    now = now or datetime.now(timezone.utc)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow_start = today_start + timedelta(days=1)
+    trends_start = day_bucket(now - timedelta(days=MONTHLY_TRENDS_DAYS))
+    weeks_start = day_bucket(now - timedelta(days=WEEKLY_TRENDS_DAYS))
+    categories = defaultdict(lambda: {"total": 0.0, "count": 0})
+    months = defaultdict(lambda: {"total": 0.0, "count": 0})
+    weeks = defaultdict(lambda: {"total": 0.0, "count": 0})
+    expenses = []
+    today_expenses = []
+    total = today_total = 0.0
+    for doc in docs:
+        date = _as_utc(doc["date"])
+        category = doc.get("category") or "Other"
+        amount = doc["amount"]
+        total += amount
+        categories[category]["total"] += amount
+        categories[category]["count"] += 1
+        if date >= trends_start:
+            months[date.strftime("%b %Y")]["total"] += amount
+            months[date.strftime("%b %Y")]["count"] += 1
+        if date >= weeks_start:
+            # %U numbers weeks the way MongoDB's $week does
+            weeks[date.strftime("%Y-%U")]["total"] += amount
+            weeks[date.strftime("%Y-%U")]["count"] += 1
+        expense = serialize_expense(dict(doc))
+        expenses.append(expense)
+        if today_start <= date < tomorrow_start:
+            today_total += amount
+            today_expenses.append(expense)
+    return {
+        "expenses": expenses,
+        "today_expenses": today_expenses,
+        "total_delta": total,
+        "today_total_delta": today_total,
+        "category_deltas": categories,
+        "month_deltas": months,
+        "week_deltas": weeks,
+    }
+
+
+class EventBroker:
+    """Fans encoded SSE frames out to per-client queues, grouped by user.
+
+    Each event is encoded once however many of the user's clients are
+    connected. A client whose queue is full is not waited for: its backlog
+    is replaced by a single resync frame.
+    """
+
+    def __init__(self, source: str = EVENTS_SOURCE, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.source = source
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._watcher = None
+
+    @property
+    def subscribers(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id: str, event: str, data: dict):
+        """Send an event to the clients of `user_id`, or of every user when it is None"""
+        if user_id is None:
+            queues = [queue for user_queues in self._subscribers.values() for queue in user_queues]
+        else:
+            queues = self._subscribers.get(user_id)
+        if not queues:
+            return
+        frame = _frame(event, data)
+        metrics.incr("events.published")
+        for queue in queues:
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                metrics.incr("events.resync")
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC_FRAME)
+
+    def _publish_expenses(self, docs):
+        by_user = defaultdict(list)
+        for doc in docs:
+            by_user[doc["user_id"]].append(doc)
+        for user_id, user_docs in by_user.items():
+            if user_id not in self._subscribers:
+                continue
+            if len(user_docs) > EVENTS_MAX_EXPENSES:
+                self.publish(user_id, "resync", {})
+            else:
+                self.publish(user_id, "expenses", expense_delta(user_docs))
+
+    # Hooks for the write paths; no-ops when the change stream publishes instead
+
+    def expenses_added(self, docs):
+        if self.source == "local":
+            self._publish_expenses(docs)
+
+    def expenses_cleared(self, user_id: str):
+        if self.source == "local":
+            self.publish(user_id, "cleared", {})
+
+    async def stream(self, user_id: str, heartbeat_seconds: float = EVENTS_HEARTBEAT_SECONDS):
+        """SSE frames for one of `user_id`'s clients, with comment heartbeats to keep proxies from timing out"""
+        queue = self.subscribe(user_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(user_id, queue)
+
+    def start(self, collection):
+        """Begin publishing from a change stream when EVENTS_SOURCE=change_stream"""
+        if self.source == "change_stream":
+            self._watcher = asyncio.create_task(self._watch(collection), name="events-change-stream")
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    async def _watch(self, collection):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "delete", "drop"]}}}]
+        loop = asyncio.get_running_loop()
+        last_resync = 0.0
+        while True:
+            try:
+                async with collection.watch(pipeline) as stream:
+                    async for change in stream:
+                        if change["operationType"] == "insert":
+                            self._publish_expenses([change["fullDocument"]])
+                        elif loop.time() - last_resync >= 1.0:
+                            # Deletions carry no amounts; let clients reload, at most once a second
+                            last_resync = loop.time()
+                            self.publish(None, "resync", {})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Expense change stream failed, retrying: {e}")
+                await asyncio.sleep(5)
+
+
+event_broker = EventBroker()
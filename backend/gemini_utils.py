@@ -1,17 +1,20 @@
-import google.generativeai as genai
 import os
-from dotenv import load_dotenv
 import json
 import logging
 import re
+import asyncio
 from datetime import datetime, timezone
+import metrics
+from llm_client import get_llm_client, LLMError, LLMOverloadedError
+from categorizer import categorize_locally, keyword_category
+from category_cache import category_cache, normalize_title
+from local_parser import parse_locally, parse_expense_locally
+from profiling import stage
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# When enabled, /parse_expense extracts fields and category in one model call
+LLM_SINGLE_SHOT = os.getenv("LLM_SINGLE_SHOT", "true").lower() in ("1", "true", "yes")
 
 # Predefined categories for consistent categorization
 EXPENSE_CATEGORIES = [
@@ -21,14 +24,29 @@ EXPENSE_CATEGORIES = [
     "Gifts & Donations", "Subscriptions", "Other"
 ]
 
-def categorize_expense_with_gemini(title: str):
-    """Categorize expense based on title using Gemini AI"""
-    try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        categories_str = ", ".join(EXPENSE_CATEGORIES)
-        
-        prompt = f"""
+# Latency budgets for interactive model calls; past them the local fallbacks answer
+LLM_CATEGORIZE_BUDGET_SECONDS = float(os.getenv("LLM_CATEGORIZE_BUDGET_SECONDS", "3"))
+LLM_PARSE_BUDGET_SECONDS = float(os.getenv("LLM_PARSE_BUDGET_SECONDS", "8"))
+
+# Titles per prompt when categorizing in bulk
+CATEGORIZE_BATCH_SIZE = int(os.getenv("CATEGORIZE_BATCH_SIZE", "50"))
+
+# JSON schema for the combined parse + categorize call
+PARSE_AND_CATEGORIZE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "amount": {"type": "number"},
+        "date": {"type": "string"},
+        "category": {"type": "string", "format": "enum", "enum": EXPENSE_CATEGORIES},
+    },
+    "required": ["title", "amount", "date", "category"],
+}
+
+def _build_categorize_prompt(title: str) -> str:
+    categories_str = ", ".join(EXPENSE_CATEGORIES)
+    
+    return f"""
         Categorize this expense into one of these categories: {categories_str}
         
         Expense: "{title}"
@@ -44,52 +62,136 @@ def categorize_expense_with_gemini(title: str):
         - "petrol" -> "Fuel"
         - "electricity bill" -> "Bills & Utilities"
         """
-        
-        response = model.generate_content(prompt)
-        category = response.text.strip()
-        
-        # Ensure the returned category is in our predefined list
-        if category in EXPENSE_CATEGORIES:
-            return category
-        else:
-            # Try to find a close match
-            title_lower = title.lower()
-            if any(word in title_lower for word in ['food', 'restaurant', 'cafe', 'coffee', 'lunch', 'dinner', 'breakfast']):
-                return "Food & Dining"
-            elif any(word in title_lower for word in ['uber', 'taxi', 'bus', 'train', 'metro', 'transport']):
-                return "Transportation"
-            elif any(word in title_lower for word in ['grocery', 'supermarket', 'vegetables', 'fruits']):
-                return "Groceries"
-            elif any(word in title_lower for word in ['petrol', 'diesel', 'fuel', 'gas']):
-                return "Fuel"
-            elif any(word in title_lower for word in ['movie', 'cinema', 'game', 'entertainment']):
-                return "Entertainment"
-            elif any(word in title_lower for word in ['electricity', 'water', 'gas', 'internet', 'phone', 'bill']):
-                return "Bills & Utilities"
-            elif any(word in title_lower for word in ['medicine', 'doctor', 'hospital', 'health']):
-                return "Healthcare"
-            elif any(word in title_lower for word in ['book', 'course', 'education', 'school', 'college']):
-                return "Education"
-            elif any(word in title_lower for word in ['shop', 'shopping', 'clothes', 'dress']):
-                return "Shopping"
-            elif any(word in title_lower for word in ['netflix', 'spotify', 'subscription', 'prime']):
-                return "Subscriptions"
-            else:
-                return "Other"
-        
+
+async def _cached_category(title: str, user_id: str = None):
+    """Cached category for `title` as `user_id` sees it, ignoring entries that are not in EXPENSE_CATEGORIES"""
+    category = await category_cache.get(title, user_id)
+    return category if category in EXPENSE_CATEGORIES else None
+
+def _resolve_category(response_text: str, title: str) -> str:
+    category = response_text.strip()
+    
+    # Ensure the returned category is in our predefined list
+    if category in EXPENSE_CATEGORIES:
+        return category
+    # Try to find a close match
+    return keyword_category(title)
+
+def categorize_expense_with_gemini(title: str):
+    """Blocking wrapper around categorize_expense_async for scripts.
+
+    Must not be called from inside a running event loop.
+    """
+    return asyncio.run(categorize_expense_async(title))
+
+async def categorize_expense_async(title: str, user_id: str = None):
+    """Categorize an expense title.
+
+    Checks the category cache (including `user_id`'s own corrections) and
+    the local index before going through the shared LLM client; model
+    answers are written back to the cache.
+    """
+    cached_category = await _cached_category(title, user_id)
+    if cached_category:
+        return cached_category
+    local_category = categorize_locally(title)
+    if local_category:
+        category_cache.remember_local(title, local_category)
+        return local_category
+    try:
+        response_text = await get_llm_client().generate(_build_categorize_prompt(title),
+                                                        timeout=LLM_CATEGORIZE_BUDGET_SECONDS)
+        category = _resolve_category(response_text, title)
+        await category_cache.set(title, category)
+        return category
+    except LLMError as e:
+        logger.warning(f"LLM unavailable for categorization, using keywords: {e}")
+        metrics.incr("llm.fallback.categorize")
+        return keyword_category(title)
     except Exception as e:
         logger.error(f"Error categorizing expense: {e}")
         return "Other"
 
-def parse_expense_with_gemini(message: str):
-    try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
+def _build_categorize_batch_prompt(titles) -> str:
+    categories_str = ", ".join(EXPENSE_CATEGORIES)
+    numbered = "\n".join(f"{i + 1}. {title}" for i, title in enumerate(titles))
+    
+    return f"""
+        Categorize each of these expenses into one of these categories: {categories_str}
         
-        # Get current date and time in IST
-        current_time = datetime.now(timezone.utc)
-        current_time_str = current_time.strftime("%Y-%m-%dT%H:%M:%S")
+        Expenses:
+        {numbered}
         
-        prompt = f"""
+        Return a JSON array with exactly {len(titles)} category names, in the same order.
+        Use "Other" when unsure.
+        """
+
+async def _categorize_batch_with_llm(titles):
+    try:
+        response_text = await get_llm_client().generate(
+            _build_categorize_batch_prompt(titles),
+            response_schema={
+                "type": "array",
+                "items": {"type": "string", "format": "enum", "enum": EXPENSE_CATEGORIES},
+            },
+        )
+        categories = json.loads(response_text)
+    except LLMError as e:
+        logger.warning(f"LLM unavailable for batch categorization, using keywords: {e}")
+        metrics.incr("llm.fallback.categorize", len(titles))
+        return [keyword_category(title) for title in titles]
+    except (json.JSONDecodeError, AttributeError, ValueError) as e:
+        logger.error(f"Error parsing batch categorization response: {e}")
+        return [keyword_category(title) for title in titles]
+    
+    if not isinstance(categories, list) or len(categories) != len(titles):
+        logger.warning("Batch categorization returned the wrong number of categories")
+        categories = [None] * len(titles)
+    resolved = []
+    for title, category in zip(titles, categories):
+        if category not in EXPENSE_CATEGORIES:
+            category = keyword_category(title)
+        else:
+            await category_cache.set(title, category)
+        resolved.append(category)
+    return resolved
+
+async def categorize_titles_async(titles, user_id: str = None):
+    """Categorize many titles at once, returning categories in input order.
+
+    Distinct titles are looked up in the cache together, then in the local
+    index; the remainder is sent to the model CATEGORIZE_BATCH_SIZE titles
+    per prompt.
+    """
+    resolved = {"": "Other"}
+    cached = await category_cache.get_many(titles, user_id)
+    pending = {}
+    for title in titles:
+        key = normalize_title(title)
+        if key in resolved or key in pending:
+            continue
+        category = cached.get(key)
+        if category not in EXPENSE_CATEGORIES:
+            category = categorize_locally(title)
+        if category:
+            resolved[key] = category
+        else:
+            pending[key] = None
+    
+    pending = list(pending)
+    
+    if pending:
+        chunks = [pending[i:i + CATEGORIZE_BATCH_SIZE] for i in range(0, len(pending), CATEGORIZE_BATCH_SIZE)]
+        results = await asyncio.gather(*(_categorize_batch_with_llm(chunk) for chunk in chunks))
+        for chunk, categories in zip(chunks, results):
+            resolved.update(zip(chunk, categories))
+    
+    return [resolved.get(normalize_title(title), "Other") for title in titles]
+
+def _build_parse_prompt(message: str, current_time: datetime) -> str:
+    current_time_str = current_time.strftime("%Y-%m-%dT%H:%M:%S")
+    
+    return f"""
         Parse this expense message and return a valid JSON object with these exact fields:
         - "title": A brief description of the expense
         - "amount": The amount as a number (not string)
@@ -102,55 +204,168 @@ def parse_expense_with_gemini(message: str):
         
         Return ONLY the JSON object, no extra text or formatting:
         """
-        
-        response = model.generate_content(prompt)
-        logger.debug(f"Raw Gemini response: {response.text}")
-        
-        # Clean the response to extract JSON content
-        cleaned_response = response.text.strip()
-        
-        # Remove markdown code blocks if present
-        if cleaned_response.startswith("```json"):
-            cleaned_response = cleaned_response[7:].rstrip("```").strip()
-        elif cleaned_response.startswith("```"):
-            cleaned_response = cleaned_response[3:].rstrip("```").strip()
-        
-        # Remove any extra text before/after JSON
-        json_match = re.search(r'\{.*\}', cleaned_response, re.DOTALL)
+
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+def _parse_response_json(response_text: str, current_time: datetime):
+    """Extract and validate the expense JSON object from a raw model response"""
+    logger.debug("Raw Gemini response: %s", response_text)
+    
+    # Clean the response to extract JSON content
+    cleaned_response = response_text.strip()
+    
+    # Remove markdown code blocks if present
+    if cleaned_response.startswith("```json"):
+        cleaned_response = cleaned_response[7:].rstrip("```").strip()
+    elif cleaned_response.startswith("```"):
+        cleaned_response = cleaned_response[3:].rstrip("```").strip()
+    
+    # Remove any extra text before/after JSON; schema-constrained answers are already bare
+    if not (cleaned_response.startswith("{") and cleaned_response.endswith("}")):
+        json_match = _JSON_OBJECT_RE.search(cleaned_response)
         if json_match:
             cleaned_response = json_match.group(0)
+    
+    if not cleaned_response or cleaned_response == "":
+        logger.error("Empty response from Gemini after cleaning")
+        return None
+    
+    logger.debug("Cleaned JSON string: %s", cleaned_response)
+    
+    parsed_data = json.loads(cleaned_response)
+    
+    # Validate required fields
+    if not all(key in parsed_data for key in ["title", "amount", "date"]):
+        logger.warning("Parsed data missing required fields")
+        return None
+    
+    # Convert amount to float if it's a string
+    if isinstance(parsed_data["amount"], str):
+        parsed_data["amount"] = float(parsed_data["amount"])
+    
+    # Ensure date is in proper format
+    if isinstance(parsed_data["date"], str):
+        try:
+            # Try to parse and reformat the date
+            parsed_date = datetime.fromisoformat(parsed_data["date"].replace('Z', ''))
+            parsed_data["date"] = parsed_date.isoformat()
+        except ValueError:
+            # If parsing fails, use current time
+            parsed_data["date"] = current_time.isoformat()
+    
+    logger.debug("Final parsed data: %s", parsed_data)
+    return parsed_data
+
+def parse_expense_with_gemini(message: str):
+    """Blocking wrapper around parse_expense_async for scripts.
+
+    Must not be called from inside a running event loop.
+    """
+    try:
+        return asyncio.run(parse_expense_async(message))
+    except LLMError as e:
+        logger.error(f"Error parsing expense: {e}")
+        return None
+
+def _parse_without_model(message: str, current_time: datetime, error: LLMError):
+    """Regex fallback for a failed model parse; re-raises `error` if it finds nothing"""
+    if isinstance(error, LLMOverloadedError):
+        raise error
+    parsed_data = parse_expense_locally(message, current_time)
+    if parsed_data is None:
+        raise error
+    logger.warning(f"LLM unavailable for parsing, used the local parser: {error}")
+    metrics.incr("llm.fallback.parse")
+    return parsed_data
+
+async def parse_expense_async(message: str):
+    """Parse a natural-language expense message into title, amount and date.
+
+    Confident rule-based parses are returned without calling the model. When
+    the model fails, times out or its circuit breaker is open the local
+    regex parser answers instead. LLM errors propagate only when that finds
+    nothing, and overload always propagates so the caller can answer 503.
+    """
+    current_time = datetime.now(timezone.utc)
+    parsed_data = parse_locally(message, current_time)
+    if parsed_data is not None:
+        return parsed_data
+    try:
+        response_text = await get_llm_client().generate(_build_parse_prompt(message, current_time),
+                                                        timeout=LLM_PARSE_BUDGET_SECONDS)
+    except LLMError as e:
+        return _parse_without_model(message, current_time, e)
+    try:
+        with stage("llm_json"):
+            return _parse_response_json(response_text, current_time)
+    except (json.JSONDecodeError, AttributeError, ValueError) as e:
+        logger.error(f"Error parsing Gemini response: {e}")
+        logger.error(f"Response text: {response_text}")
+        return None
+
+def _build_parse_and_categorize_prompt(message: str, current_time: datetime) -> str:
+    current_time_str = current_time.strftime("%Y-%m-%dT%H:%M:%S")
+    categories_str = ", ".join(EXPENSE_CATEGORIES)
+    
+    return f"""
+        Parse this expense message and return a JSON object with these exact fields:
+        - "title": A brief description of the expense
+        - "amount": The amount as a number (not string)
+        - "date": ISO format datetime string (YYYY-MM-DDTHH:MM:SS)
+        - "category": One of: {categories_str}
         
-        if not cleaned_response or cleaned_response == "":
-            logger.error("Empty response from Gemini after cleaning")
-            return None
-        
-        logger.debug(f"Cleaned JSON string: {cleaned_response}")
-        
-        parsed_data = json.loads(cleaned_response)
-        
-        # Validate required fields
-        if not all(key in parsed_data for key in ["title", "amount", "date"]):
-            logger.warning("Parsed data missing required fields")
-            return None
-        
-        # Convert amount to float if it's a string
-        if isinstance(parsed_data["amount"], str):
-            parsed_data["amount"] = float(parsed_data["amount"])
-        
-        # Ensure date is in proper format
-        if isinstance(parsed_data["date"], str):
-            try:
-                # Try to parse and reformat the date
-                parsed_date = datetime.fromisoformat(parsed_data["date"].replace('Z', ''))
-                parsed_data["date"] = parsed_date.isoformat()
-            except ValueError:
-                # If parsing fails, use current time
-                parsed_data["date"] = current_time.isoformat()
+        Message: "{message}"
         
-        logger.debug(f"Final parsed data: {parsed_data}")
+        If no date/time is mentioned, use the current time: {current_time_str}
+        If only date is mentioned (no time), assume evening time like 19:00:00
+        If unsure about the category, use "Other".
+        """
+
+async def parse_and_categorize_async(message: str, user_id: str = None):
+    """Parse a message and categorize it with a single schema-constrained model call.
+
+    Returns the same shape as parse_expense_async plus a "category" key, or
+    None if the response could not be parsed. Uses the rule-based parser
+    first and falls back like parse_expense_async; locally parsed messages
+    go through categorize_expense_async instead of the combined prompt.
+    """
+    current_time = datetime.now(timezone.utc)
+    parsed_data = parse_locally(message, current_time)
+    if parsed_data is not None:
+        parsed_data["category"] = await categorize_expense_async(parsed_data["title"], user_id)
         return parsed_data
-        
+    try:
+        response_text = await get_llm_client().generate(
+            _build_parse_and_categorize_prompt(message, current_time),
+            response_schema=PARSE_AND_CATEGORIZE_SCHEMA,
+            timeout=LLM_PARSE_BUDGET_SECONDS,
+        )
+    except LLMError as e:
+        parsed_data = _parse_without_model(message, current_time, e)
+        parsed_data["category"] = (await _cached_category(parsed_data["title"], user_id)
+                                   or categorize_locally(parsed_data["title"])
+                                   or keyword_category(parsed_data["title"]))
+        return parsed_data
+    try:
+        with stage("llm_json"):
+            parsed_data = _parse_response_json(response_text, current_time)
     except (json.JSONDecodeError, AttributeError, ValueError) as e:
         logger.error(f"Error parsing Gemini response: {e}")
-        logger.error(f"Response text: {response.text if 'response' in locals() else 'No response'}")
-        return None
\ No newline at end of file
+        logger.error(f"Response text: {response_text}")
+        return None
+    if parsed_data is None:
+        return None
+    
+    # Earlier answers and user corrections for the same title take precedence
+    cached_category = await _cached_category(parsed_data["title"], user_id)
+    if cached_category:
+        parsed_data["category"] = cached_category
+        return parsed_data
+    
+    category = parsed_data.get("category")
+    if category not in EXPENSE_CATEGORIES:
+        category = keyword_category(parsed_data["title"])
+    else:
+        await category_cache.set(parsed_data["title"], category)
+    parsed_data["category"] = category
+    return parsed_data
@@ -0,0 +1,163 @@
+"""Index declarations and query-plan checks for the expense collections.
+
+ensure_indexes() runs on startup and is safe to repeat: MongoDB treats
+creating an identical index as a no-op. check_query_plans() explains each
+endpoint's query and fails if one would scan the collection or sort in
+memory. Run it on demand with:
+    python backend/indexes.py --explain
+or on every startup by setting EXPLAIN_CHECK=1.
+"""
+import os
+import logging
+from datetime import datetime, timezone, timedelta
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+import jobs
+import rollups
+from tenancy import DEFAULT_USER_ID
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_CHECK = os.getenv("EXPLAIN_CHECK", "false").lower() in ("1", "true", "yes")
+# Collections smaller than this are not worth failing over
+EXPLAIN_MIN_DOCUMENTS = int(os.getenv("EXPLAIN_MIN_DOCUMENTS", "10000"))
+
+# Every expense query is scoped to one user, so every index leads with user_id
+EXPENSE_INDEXES = [
+    # /today_expenses, /all_expenses keyset pages and any date-range scan
+    IndexModel([("user_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="user_date_id"),
+    # category-filtered listings
+    IndexModel([("user_id", ASCENDING), ("category", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+               name="user_category_date_id"),
+]
+
+BAD_STAGES = {"COLLSCAN", "SORT"}
+
+
+class QueryPlanError(Exception):
+    """Raised when an endpoint query would scan a collection or sort in memory"""
+
+
+async def ensure_indexes(db, category_cache=None):
+    await db.expenses.create_indexes(EXPENSE_INDEXES)
+    await rollups.ensure_indexes(db.expense_rollups)
+    await jobs.ensure_indexes(db.parse_jobs)
+    if category_cache is not None:
+        await category_cache.ensure_indexes()
+
+
+def _plan_checks():
+    """(endpoint, collection name, explain command) for each indexed endpoint query"""
+    now = datetime.now(timezone.utc)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    user_id = DEFAULT_USER_ID
+    return [
+        ("/today_expenses", "expenses", {
+            "find": "expenses",
+            "filter": {"user_id": user_id, "date": {"$gte": today_start, "$lt": today_start + timedelta(days=1)}},
+            "sort": {"date": -1, "_id": -1},
+        }),
+        ("/all_expenses", "expenses", {
+            "find": "expenses",
+            "filter": {"user_id": user_id},
+            "sort": {"date": -1, "_id": -1},
+        }),
+        ("/all_expenses?category=", "expenses", {
+            "find": "expenses",
+            "filter": {"user_id": user_id, "category": "Other"},
+            "sort": {"date": -1, "_id": -1},
+        }),
+        ("/summary", "expense_rollups", {
+            "aggregate": "expense_rollups",
+            "pipeline": rollups.summary_pipeline(user_id),
+            "cursor": {},
+        }),
+        ("/monthly_trends", "expense_rollups", {
+            "aggregate": "expense_rollups",
+            "pipeline": rollups.monthly_trends_pipeline(user_id, now - timedelta(days=180)),
+            "cursor": {},
+        }),
+        ("/weekly_trends", "expense_rollups", {
+            "aggregate": "expense_rollups",
+            "pipeline": rollups.weekly_trends_pipeline(user_id, now - timedelta(days=28)),
+            "cursor": {},
+        }),
+    ]
+
+
+def _find_stages(plan, found=None):
+    """Collect every "stage" name anywhere in an explain document"""
+    found = set() if found is None else found
+    if isinstance(plan, dict):
+        stage = plan.get("stage")
+        if isinstance(stage, str):
+            found.add(stage)
+        for value in plan.values():
+            _find_stages(value, found)
+    elif isinstance(plan, list):
+        for value in plan:
+            _find_stages(value, found)
+    return found
+
+
+def _winning_plans(explain):
+    """The winning plan(s) of a find or aggregate explain, ignoring rejected plans"""
+    plans = []
+    if isinstance(explain, dict):
+        planner = explain.get("queryPlanner")
+        if isinstance(planner, dict):
+            plans.append(planner.get("winningPlan"))
+        for key, value in explain.items():
+            if key != "queryPlanner" and isinstance(value, (dict, list)):
+                plans.extend(_winning_plans(value))
+    elif isinstance(explain, list):
+        for value in explain:
+            plans.extend(_winning_plans(value))
+    return plans
+
+
+async def check_query_plans(db, min_documents: int = EXPLAIN_MIN_DOCUMENTS):
+    """Explain each endpoint query and raise QueryPlanError on COLLSCAN or in-memory SORT"""
+    problems = []
+    for endpoint, collection_name, command in _plan_checks():
+        size = await db[collection_name].estimated_document_count()
+        if size < min_documents:
+            logger.debug(f"Skipping plan check for {endpoint}: {collection_name} has {size} documents")
+            continue
+        explain = await db.command("explain", command, verbosity="queryPlanner")
+        bad = set()
+        for plan in _winning_plans(explain):
+            bad |= _find_stages(plan) & BAD_STAGES
+        if bad:
+            problems.append(f"{endpoint} on {collection_name} ({size} docs): {', '.join(sorted(bad))}")
+        else:
+            logger.info(f"Query plan OK for {endpoint}")
+
+    if problems:
+        raise QueryPlanError("Unindexed endpoint queries:\n  " + "\n  ".join(problems))
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    import database
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--explain", action="store_true", help="check endpoint query plans")
+    parser.add_argument("--min-documents", type=int, default=EXPLAIN_MIN_DOCUMENTS)
+    args = parser.parse_args()
+
+    async def _main(db):
+        await ensure_indexes(db)
+        print("Indexes are up to date")
+        if args.explain:
+            await check_query_plans(db, args.min_documents)
+            print("All endpoint query plans use indexes")
+
+    try:
+        database.run_cli(_main)
+    except QueryPlanError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,201 @@
+"""Durable parse jobs stored in MongoDB and worked by an asyncio pool.
+
+A job is accepted with one insert and processed later by a worker, so the
+request that submitted it never waits on the model. Jobs are claimed with
+an atomic find_one_and_update and a lease, which the worker renews while
+the handler runs; a job whose worker died is picked up again once its
+lease expires. Only the worker holding the current lease can finish a
+job. A job can still run more than once (a lost lease, a failure after
+the handler's write), so handlers must be idempotent. Failures are retried
+with exponential backoff up to JOB_MAX_ATTEMPTS.
+"""
+import os
+import random
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+JOB_BACKOFF_BASE_SECONDS = float(os.getenv("JOB_BACKOFF_BASE_SECONDS", "2.0"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "300"))
+# Finished jobs are removed this long after they complete
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+
+async def ensure_indexes(jobs):
+    await jobs.create_index([("status", ASCENDING), ("next_attempt_at", ASCENDING)])
+    await jobs.create_index("finished_at", expireAfterSeconds=JOB_RETENTION_SECONDS)
+
+
+async def enqueue(jobs, payload: dict) -> str:
+    now = datetime.now(timezone.utc)
+    result = await jobs.insert_one({
+        **payload,
+        "status": PENDING,
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+        "updated_at": now,
+    })
+    metrics.incr("jobs.enqueued")
+    return str(result.inserted_id)
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with full jitter for the given attempt number"""
+    ceiling = min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class JobWorkerPool:
+    """Runs `handler(job)` for claimed jobs on `concurrency` asyncio tasks.
+
+    The handler returns a dict stored as the job's result; any exception
+    counts as a failed attempt.
+    """
+
+    def __init__(self, jobs, handler, concurrency: int = JOB_WORKERS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, lease_seconds: int = JOB_LEASE_SECONDS,
+                 poll_seconds: float = JOB_POLL_SECONDS):
+        self.jobs = jobs
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+
+    def start(self):
+        for index in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._run(), name=f"job-worker-{index}"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers in this process after a local enqueue"""
+        self._wakeup.set()
+
+    async def _claim(self):
+        now = datetime.now(timezone.utc)
+        return await self.jobs.find_one_and_update(
+            {"$or": [
+                {"status": PENDING, "next_attempt_at": {"$lte": now}},
+                {"status": PROCESSING, "lease_expires_at": {"$lt": now}},
+            ]},
+            {
+                "$set": {
+                    "status": PROCESSING,
+                    "lease_id": ObjectId(),
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("next_attempt_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _idle(self):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Could not claim a job: {e}")
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            if job is None:
+                await self._idle()
+                continue
+            try:
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The job is picked up again once its lease expires
+                logger.error(f"Could not process job {job['_id']}: {e}")
+
+    def _leased(self, job) -> dict:
+        """Filter matching `job` only while this worker still holds its lease"""
+        return {"_id": job["_id"], "lease_id": job["lease_id"]}
+
+    async def _renew_lease(self, job):
+        """Keep extending the lease while the handler runs, so slow jobs are not claimed twice"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            now = datetime.now(timezone.utc)
+            try:
+                result = await self.jobs.update_one(self._leased(job), {"$set": {
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now,
+                }})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not renew the lease of job {job['_id']}: {e}")
+                continue
+            if result.matched_count == 0:
+                logger.warning(f"Job {job['_id']} lost its lease to another worker")
+                return
+
+    async def _process(self, job):
+        renewer = asyncio.create_task(self._renew_lease(job), name=f"job-lease-{job['_id']}")
+        try:
+            result = await self.handler(job)
+        except asyncio.CancelledError:
+            # Leave the job leased; another worker picks it up when the lease runs out
+            raise
+        except Exception as e:
+            now = datetime.now(timezone.utc)
+            if job["attempts"] >= self.max_attempts:
+                logger.error(f"Job {job['_id']} failed permanently: {e}")
+                metrics.incr("jobs.failed")
+                update = {"status": FAILED, "error": str(e), "finished_at": now}
+            else:
+                delay = backoff_seconds(job["attempts"])
+                logger.warning(f"Job {job['_id']} attempt {job['attempts']} failed, retrying in {delay:.1f}s: {e}")
+                metrics.incr("jobs.retried")
+                update = {"status": PENDING, "error": str(e),
+                          "next_attempt_at": now + timedelta(seconds=delay)}
+        else:
+            now = datetime.now(timezone.utc)
+            metrics.incr("jobs.done")
+            update = {"status": DONE, "result": result, "error": None, "finished_at": now}
+        finally:
+            renewer.cancel()
+
+        update["updated_at"] = now
+        finished = await self.jobs.update_one(self._leased(job),
+                                              {"$set": update, "$unset": {"lease_expires_at": "", "lease_id": ""}})
+        if finished.matched_count == 0:
+            # Another worker claimed the job after our lease ran out; its outcome wins
+            logger.warning(f"Job {job['_id']} finished after losing its lease; result discarded")
+            metrics.incr("jobs.lease_lost")
@@ -0,0 +1,273 @@
+import asyncio
+import os
+import time
+import logging
+from collections import deque
+
+import metrics
+from profiling import stage
+from llm_providers import LLMProvider, get_provider
+
+logger = logging.getLogger(__name__)
+
+# Concurrency limits for outbound model calls. Requests beyond
+# LLM_MAX_CONCURRENCY wait in line; once LLM_MAX_PENDING callers are already
+# waiting, new callers are rejected immediately instead of piling up.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_PENDING = int(os.getenv("LLM_MAX_PENDING", "32"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "15"))
+
+# After LLM_BREAKER_FAILURES consecutive failures calls are rejected outright
+# for LLM_BREAKER_RESET_SECONDS, then a single trial call decides whether to
+# close the breaker again.
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# When enabled, a call still running after the LLM_HEDGE_PERCENTILE latency
+# of recent calls gets a second, identical request; the first answer wins.
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+
+class LLMError(Exception):
+    """Base class for failures raised by the LLM client"""
+
+
+class LLMOverloadedError(LLMError):
+    """Raised when too many calls are already waiting for a slot"""
+
+
+class LLMTimeoutError(LLMError):
+    """Raised when a model call exceeds its timeout"""
+
+
+class LLMProviderError(LLMError):
+    """Raised when the provider itself fails (network, quota, injected errors)"""
+
+
+class LLMCircuitOpenError(LLMError):
+    """Raised without calling the provider while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a half-open trial call"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES,
+                 reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; claims the trial slot when half-open"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logger.info("LLM circuit breaker closed")
+        self.failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_in_flight or (self._opened_at is None and self.failures >= self.failure_threshold):
+            logger.warning(f"LLM circuit breaker opened after {self.failures} consecutive failures")
+            metrics.incr("llm.breaker.opened")
+            self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def release(self):
+        """Give the trial slot back when a call ended without a verdict"""
+        self._trial_in_flight = False
+
+
+class LLMClient:
+    """Async gateway for model calls with a bounded concurrency pool.
+
+    `provider` is an LLMProvider; it defaults to the one named by LLM_PROVIDER.
+    Failures and timeouts feed a CircuitBreaker, and with `hedge` enabled slow
+    calls are duplicated once a spare slot is available.
+    """
+
+    def __init__(self, provider: LLMProvider = None, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_pending: int = LLM_MAX_PENDING, timeout: float = LLM_TIMEOUT_SECONDS,
+                 breaker: CircuitBreaker = None, hedge: bool = LLM_HEDGE):
+        self.provider = provider or get_provider()
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending = 0
+        self._in_flight = 0
+        self._latencies = deque(maxlen=500)
+
+    @property
+    def stats(self):
+        return {
+            "provider": self.provider.name,
+            "in_flight": self._in_flight,
+            "pending": self._pending,
+            "max_concurrency": self.max_concurrency,
+            "max_pending": self.max_pending,
+            "queue_timeouts": metrics.get("llm.queue_timeout"),
+            "breaker": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.failures,
+                "opened": metrics.get("llm.breaker.opened"),
+                "rejected": metrics.get("llm.breaker.rejected"),
+            },
+            "hedge": {
+                "enabled": self.hedge,
+                "delay_seconds": self._hedge_delay(),
+                "hedged": metrics.get("llm.hedged"),
+                "hedge_wins": metrics.get("llm.hedge_won"),
+            },
+            "fallbacks": {
+                "categorize": metrics.get("llm.fallback.categorize"),
+                "parse": metrics.get("llm.fallback.parse"),
+            },
+        }
+
+    def warmup(self):
+        """Build the underlying model up front so the first request does not pay for it"""
+        self.provider.warmup()
+
+    def _hedge_delay(self):
+        """Recent LLM_HEDGE_PERCENTILE latency, or None until enough calls were timed"""
+        if len(self._latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * LLM_HEDGE_PERCENTILE / 100))]
+
+    async def _hedged_generate(self, prompt: str, response_schema: dict = None) -> str:
+        delay = self._hedge_delay() if self.hedge else None
+        if delay is None:
+            return await self.provider.generate(prompt, response_schema)
+
+        primary = asyncio.ensure_future(self.provider.generate(prompt, response_schema))
+        tasks = {primary}
+        hedge_acquired = False
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            # Only hedge into spare capacity so hedging never queues real calls
+            if not done and not self._semaphore.locked():
+                await self._semaphore.acquire()
+                hedge_acquired = True
+                metrics.incr("llm.hedged")
+                tasks.add(asyncio.ensure_future(self.provider.generate(prompt, response_schema)))
+            while True:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None or not tasks:
+                        if task is not primary:
+                            metrics.incr("llm.hedge_won")
+                        return task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if hedge_acquired:
+                self._semaphore.release()
+
+    async def generate(self, prompt: str, response_schema: dict = None, timeout: float = None) -> str:
+        """Run one model call, waiting for a free slot first.
+
+        When `response_schema` is given the model is asked for JSON output
+        constrained to that schema. `timeout` is the latency budget for this
+        call, time spent waiting for a slot included, and defaults to the
+        client-wide timeout. Raises
+        LLMCircuitOpenError without calling the provider while the breaker
+        is open.
+        """
+        with stage("llm"):
+            return await self._generate(prompt, response_schema, timeout)
+
+    async def _generate(self, prompt: str, response_schema: dict, timeout: float) -> str:
+        if not self.breaker.allow():
+            metrics.incr("llm.breaker.rejected")
+            raise LLMCircuitOpenError("LLM circuit breaker is open")
+        if self._semaphore.locked() and self._pending >= self.max_pending:
+            self.breaker.release()
+            raise LLMOverloadedError("LLM request queue is full")
+
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        self._pending += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            # The provider was never called, so this says nothing about its health
+            self.breaker.release()
+            metrics.incr("llm.queue_timeout")
+            logger.warning(f"LLM call spent its {timeout}s budget waiting for a slot")
+            raise LLMTimeoutError(f"LLM call timed out after {timeout}s waiting for a slot")
+        except BaseException:
+            self.breaker.release()
+            raise
+        finally:
+            self._pending -= 1
+
+        self._in_flight += 1
+        start = time.monotonic()
+        try:
+            response = await asyncio.wait_for(self._hedged_generate(prompt, response_schema),
+                                              timeout=max(0.0, deadline - start))
+        except asyncio.TimeoutError:
+            logger.warning(f"LLM call timed out after {timeout}s")
+            self.breaker.record_failure()
+            raise LLMTimeoutError(f"LLM call timed out after {timeout}s")
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception as e:
+            logger.warning(f"LLM provider {self.provider.name} failed: {e}")
+            self.breaker.record_failure()
+            raise LLMProviderError(str(e)) from e
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+        self._latencies.append(time.monotonic() - start)
+        self.breaker.record_success()
+        return response
+
+
+_client = None
+
+
+def get_llm_client() -> LLMClient:
+    """Return the shared LLM client, creating it on first use"""
+    global _client
+    if _client is None:
+        _client = LLMClient()
+    return _client
+
+
+def set_llm_client(client: LLMClient):
+    """Replace the shared LLM client (used by benchmarks to inject stubs)"""
+    global _client
+    _client = client
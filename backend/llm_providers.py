@@ -0,0 +1,150 @@
+import os
+import re
+import json
+import random
+import asyncio
+import logging
+from datetime import datetime
+
+from categorizer import classify
+from local_parser import parse_expense_locally
+
+logger = logging.getLogger(__name__)
+
+# "gemini" talks to the real API; "stub" answers locally for load tests
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "gemini-1.5-flash")
+
+# Stub behaviour, see StubProvider
+LLM_STUB_LATENCY = os.getenv("LLM_STUB_LATENCY", "fixed:0")
+LLM_STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+LLM_STUB_MALFORMED_RATE = float(os.getenv("LLM_STUB_MALFORMED_RATE", "0"))
+LLM_STUB_SEED = os.getenv("LLM_STUB_SEED")
+
+
+class LLMProvider:
+    """Interface for model backends used by LLMClient"""
+
+    name = "base"
+
+    def warmup(self):
+        """Prepare expensive resources ahead of the first call"""
+
+    async def generate(self, prompt: str, response_schema: dict = None) -> str:
+        """Return the raw response text for `prompt`.
+
+        When `response_schema` is given the answer must be JSON matching it.
+        """
+        raise NotImplementedError
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini via google-generativeai; configured on first use"""
+
+    name = "gemini"
+
+    def __init__(self, model_name: str = LLM_MODEL_NAME, api_key: str = None):
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            import google.generativeai as genai
+
+            genai.configure(api_key=self.api_key or os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY"))
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def warmup(self):
+        self.model
+
+    async def generate(self, prompt: str, response_schema: dict = None) -> str:
+        generation_config = None
+        if response_schema is not None:
+            generation_config = {
+                "response_mime_type": "application/json",
+                "response_schema": response_schema,
+            }
+        response = await self.model.generate_content_async(prompt, generation_config=generation_config)
+        return response.text
+
+
+class StubProviderError(Exception):
+    """Injected failure raised by StubProvider"""
+
+
+_QUOTED_RE = re.compile(r'(?:Message|Expense): "(.*?)"', re.DOTALL)
+_CURRENT_TIME_RE = re.compile(r"use the current time: (\S+)")
+_NUMBERED_RE = re.compile(r"^\s*\d+\. (.*)$", re.MULTILINE)
+
+
+def parse_latency(spec: str):
+    """Build a latency sampler from "fixed:S", "uniform:LO:HI" or "lognormal:MU:SIGMA" (seconds)"""
+    kind, *args = spec.split(":")
+    values = [float(value) for value in args]
+    if kind == "fixed":
+        return lambda rng: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class StubProvider(LLMProvider):
+    """Deterministic local stand-in for the model.
+
+    Answers are derived from the prompt with the local categorizer and the
+    regex parser, so the full ingestion path works offline. Latency is
+    sampled from `latency` (see parse_latency); `error_rate` of calls raise
+    StubProviderError and `malformed_rate` of calls return text that is not
+    valid JSON. Pass `seed` for reproducible runs.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency: str = LLM_STUB_LATENCY, error_rate: float = LLM_STUB_ERROR_RATE,
+                 malformed_rate: float = LLM_STUB_MALFORMED_RATE, seed=LLM_STUB_SEED):
+        self._sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self._rng = random.Random(int(seed) if seed is not None else None)
+
+    @staticmethod
+    def _category(title: str) -> str:
+        return classify(title)[0]
+
+    def _answer(self, prompt: str, response_schema: dict = None) -> str:
+        if response_schema is not None and response_schema.get("type") == "array":
+            titles = _NUMBERED_RE.findall(prompt)
+            return json.dumps([self._category(title) for title in titles])
+
+        quoted = _QUOTED_RE.search(prompt)
+        text = quoted.group(1) if quoted else ""
+        if "Parse this expense message" not in prompt:
+            return self._category(text)
+
+        current_time = _CURRENT_TIME_RE.search(prompt)
+        now = datetime.fromisoformat(current_time.group(1)) if current_time else None
+        parsed = parse_expense_locally(text, now) or {"title": text or "expense", "amount": 0, "date": ""}
+        parsed["category"] = self._category(parsed["title"])
+        return json.dumps(parsed)
+
+    async def generate(self, prompt: str, response_schema: dict = None) -> str:
+        await asyncio.sleep(max(0.0, self._sample_latency(self._rng)))
+        roll = self._rng.random()
+        if roll < self.error_rate:
+            raise StubProviderError("Injected stub failure")
+        if roll < self.error_rate + self.malformed_rate:
+            return '{"title": "truncated'
+        return self._answer(prompt, response_schema)
+
+
+def get_provider(name: str = LLM_PROVIDER) -> LLMProvider:
+    if name == "stub":
+        return StubProvider()
+    if name == "gemini":
+        return GeminiProvider()
+    raise ValueError(f"Unknown LLM provider: {name}")
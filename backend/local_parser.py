@@ -0,0 +1,263 @@
+"""Rule-based parser for natural-language expense messages.
+
+Covers the common shapes ("spent ₹200 on groceries today", "uber 350
+yesterday", "dinner 1,200 on 12 Oct") with precompiled patterns and scores
+how sure it is of the result. Messages scoring at least
+LOCAL_PARSE_MIN_CONFIDENCE never reach the model; parse_expense_locally is
+also the fallback when the model is unavailable.
+"""
+import os
+import re
+from datetime import datetime, timezone, timedelta
+
+import metrics
+from categorizer import classify, LOCAL_CATEGORY_MIN_CONFIDENCE
+
+LOCAL_PARSE_MIN_CONFIDENCE = float(os.getenv("LOCAL_PARSE_MIN_CONFIDENCE", "0.8"))
+
+# Hour used when a message names a day but no time, as in the model prompt
+DEFAULT_HOUR = 19
+
+CURRENCIES = {
+    "₹": "INR", "rs": "INR", "rs.": "INR", "inr": "INR", "rupee": "INR", "rupees": "INR",
+    "$": "USD", "usd": "USD", "dollar": "USD", "dollars": "USD", "bucks": "USD",
+    "€": "EUR", "eur": "EUR", "euro": "EUR", "euros": "EUR",
+    "£": "GBP", "gbp": "GBP", "pound": "GBP", "pounds": "GBP",
+}
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3,
+    "apr": 4, "april": 4, "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7,
+    "aug": 8, "august": 8, "sep": 9, "sept": 9, "september": 9, "oct": 10, "october": 10,
+    "nov": 11, "november": 11, "dec": 12, "december": 12,
+}
+
+WEEKDAYS = {
+    "monday": 0, "mon": 0, "tuesday": 1, "tue": 1, "tues": 1, "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thur": 3, "thurs": 3, "friday": 4, "fri": 4,
+    "saturday": 5, "sat": 5, "sunday": 6, "sun": 6,
+}
+
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+                "six": 6, "seven": 7}
+
+_MONTH = r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?"
+_DAY = r"(\d{1,2})(?:st|nd|rd|th)?"
+_YEAR = r"(?:,?\s+(\d{4}))?"
+_ON = r"(?:\bon\s+)?"
+
+_ISO_DATE_RE = re.compile(_ON + r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b", re.I)
+_DAY_MONTH_RE = re.compile(_ON + r"\b" + _DAY + r"\s+(?:of\s+)?" + _MONTH + r"\b" + _YEAR, re.I)
+_MONTH_DAY_RE = re.compile(_ON + r"\b" + _MONTH + r"\s+" + _DAY + r"\b" + _YEAR, re.I)
+# Numeric dates are read day first: 12/10 is the 12th of October
+_NUMERIC_DATE_RE = re.compile(_ON + r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2}|\d{4}))?\b", re.I)
+_DAYS_AGO_RE = re.compile(r"\b(\d+|an?|one|two|three|four|five|six|seven)\s+days?\s+ago\b", re.I)
+_RELATIVE_DAY_RE = re.compile(
+    r"\b(?:(?:the\s+)?(day\s+before\s+yesterday)|(yesterday|last\s+night)|(today|tonight|this\s+(?:morning|afternoon|evening)))\b",
+    re.I,
+)
+_WEEKDAY_RE = re.compile(
+    r"\b(?:(last|this|on)\s+)?(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b"
+    r"|\b(last|on)\s+(mon|tues?|wed|thu(?:rs?)?|fri|sat|sun)\b",
+    re.I,
+)
+_TIME_12H_RE = re.compile(r"(?:\bat\s+)?\b(\d{1,2})(?::([0-5]\d))?\s*(am|pm)\b", re.I)
+_TIME_24H_RE = re.compile(r"(?:\bat\s+)?\b([01]?\d|2[0-3]):([0-5]\d)\b", re.I)
+
+_AMOUNT_RE = re.compile(
+    r"(?:(?P<pre>[₹$€£]|\b(?:rs\.?|inr|usd|eur|gbp))\s*|(?<![\w.]))"
+    r"(?P<num>\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?)(?P<k>k)?(?!\w|\.\d)"
+    r"(?:\s*(?P<post>[₹$€£]|\b(?:rs|inr|rupees?|usd|dollars?|bucks|eur|euros?|gbp|pounds?)\b))?",
+    re.I,
+)
+_CURRENCY_WORD_RE = re.compile(r"\b(?:rs|inr|rupees?|usd|dollars?|bucks|eur|euros?|gbp|pounds?)\b|[₹$€£]", re.I)
+# Dropped only at the edges of a phrase, so "gift for mom" keeps its "for"
+_EDGE_WORDS = {
+    "i", "i've", "ive", "spent", "spend", "paid", "pay", "bought", "buy", "got", "was", "it",
+    "for", "on", "at", "a", "an", "the", "my", "of", "worth", "to", "with", "from", "and",
+    "in", "via", "by",
+}
+# Date words left over after parsing mean the date was probably misread
+_VAGUE_DATE_RE = re.compile(
+    r"\b(?:last|next|ago|week|month|year|tomorrow|weekend|morning|evening|night|"
+    r"\d{1,2}(?:st|nd|rd|th))\b",
+    re.I,
+)
+_PUNCTUATION_RE = re.compile(r"[^\w&'+-]+")
+
+
+def _at_default_hour(day: datetime) -> datetime:
+    return day.replace(hour=DEFAULT_HOUR, minute=0, second=0, microsecond=0)
+
+
+def _calendar_date(now: datetime, year, month: int, day: int) -> datetime:
+    """Absolute date at DEFAULT_HOUR; without a year, the latest one not in the future"""
+    if year is None:
+        candidate = datetime(now.year, month, day, DEFAULT_HOUR, tzinfo=now.tzinfo)
+        if candidate.date() > now.date():
+            candidate = candidate.replace(year=now.year - 1)
+        return candidate
+    year = int(year)
+    if year < 100:
+        year += 2000
+    return datetime(year, month, day, DEFAULT_HOUR, tzinfo=now.tzinfo)
+
+
+def _match_date(text: str, now: datetime):
+    """Return (date, span) for the first date expression in `text`, or (None, None).
+
+    Raises ValueError for expressions that name an impossible date.
+    """
+    match = _ISO_DATE_RE.search(text)
+    if match:
+        year, month, day = match.groups()
+        return _calendar_date(now, year, int(month), int(day)), match.span()
+    match = _DAY_MONTH_RE.search(text)
+    if match:
+        day, month, year = match.groups()
+        return _calendar_date(now, year, MONTHS[month.lower()], int(day)), match.span()
+    match = _MONTH_DAY_RE.search(text)
+    if match:
+        month, day, year = match.groups()
+        return _calendar_date(now, year, MONTHS[month.lower()], int(day)), match.span()
+    match = _NUMERIC_DATE_RE.search(text)
+    if match:
+        day, month, year = match.groups()
+        return _calendar_date(now, year, int(month), int(day)), match.span()
+    match = _DAYS_AGO_RE.search(text)
+    if match:
+        count = match.group(1).lower()
+        days = int(count) if count.isdigit() else NUMBER_WORDS[count]
+        return _at_default_hour(now - timedelta(days=days)), match.span()
+    match = _RELATIVE_DAY_RE.search(text)
+    if match:
+        before_yesterday, yesterday, today = match.groups()
+        if today:
+            return now, match.span()
+        return _at_default_hour(now - timedelta(days=2 if before_yesterday else 1)), match.span()
+    match = _WEEKDAY_RE.search(text)
+    if match:
+        qualifier = (match.group(1) or match.group(3) or "").lower()
+        weekday = WEEKDAYS[(match.group(2) or match.group(4)).lower()]
+        days_back = (now.weekday() - weekday) % 7
+        if qualifier == "last" and days_back == 0:
+            days_back = 7
+        return _at_default_hour(now - timedelta(days=days_back)), match.span()
+    return None, None
+
+
+def _match_time(text: str):
+    """Return ((hour, minute), span) for the first clock time in `text`, or (None, None)"""
+    match = _TIME_12H_RE.search(text)
+    if match and 1 <= int(match.group(1)) <= 12:
+        hour = int(match.group(1)) % 12 + (12 if match.group(3).lower() == "pm" else 0)
+        return (hour, int(match.group(2) or 0)), match.span()
+    match = _TIME_24H_RE.search(text)
+    if match:
+        return (int(match.group(1)), int(match.group(2))), match.span()
+    return None, None
+
+
+def _blank(text: str, span) -> str:
+    """Cut `span` out of `text`, leaving a phrase boundary in its place"""
+    start, end = span
+    return text[:start] + "|" + text[end:]
+
+
+def _clean_title(text: str) -> str:
+    phrases = []
+    for phrase in _CURRENCY_WORD_RE.sub(" ", text).split("|"):
+        words = _PUNCTUATION_RE.sub(" ", phrase).split()
+        while words and words[0].lower() in _EDGE_WORDS:
+            words.pop(0)
+        while words and words[-1].lower() in _EDGE_WORDS:
+            words.pop()
+        phrases.extend(words)
+    return " ".join(phrases)
+
+
+def parse_message(message: str, now: datetime = None):
+    """Parse `message` with the rules above.
+
+    Returns (parsed, confidence) where parsed has title, amount, currency
+    (ISO code or None) and an ISO date, or (None, 0.0) when no amount is found.
+    """
+    now = now or datetime.now(timezone.utc)
+    text = message
+    confidence = 0.5
+
+    try:
+        date, span = _match_date(text, now)
+    except ValueError:
+        date, span = None, None
+        confidence -= 0.3
+    if span:
+        text = _blank(text, span)
+    clock, span = _match_time(text)
+    if span:
+        text = _blank(text, span)
+        date = (date or now).replace(hour=clock[0], minute=clock[1], second=0, microsecond=0)
+
+    candidates = list(_AMOUNT_RE.finditer(text))
+    if not candidates:
+        return None, 0.0
+    marked = [match for match in candidates if match.group("pre") or match.group("post")]
+
+    def value(match):
+        amount = float(match.group("num").replace(",", ""))
+        return amount * 1000 if match.group("k") else amount
+
+    if len(candidates) == 1 or len(marked) == 1:
+        confidence += 0.2
+        chosen = marked[0] if marked else candidates[0]
+    else:
+        # "2 coffees 300": several bare numbers, the total is most likely the largest
+        confidence -= 0.2
+        chosen = max(marked or candidates, key=value)
+    currency = chosen.group("pre") or chosen.group("post")
+    if currency:
+        confidence += 0.1
+        currency = CURRENCIES.get(currency.lower().strip())
+    text = _blank(text, chosen.span())
+
+    title = _clean_title(text)
+    if title:
+        confidence += 0.1
+        category, category_confidence = classify(title)
+        if category != "Other" and category_confidence >= LOCAL_CATEGORY_MIN_CONFIDENCE:
+            confidence += 0.1
+        if len(title.split()) > 5:
+            confidence -= 0.2
+        if _VAGUE_DATE_RE.search(title):
+            confidence -= 0.3
+    else:
+        confidence = min(confidence, 0.4)
+
+    parsed = {
+        "title": title or "expense",
+        "amount": value(chosen),
+        "currency": currency,
+        "date": (date or now).isoformat(),
+    }
+    return parsed, round(max(0.0, min(1.0, confidence)), 2)
+
+
+def parse_locally(message: str, now: datetime = None):
+    """Return the rule-based parse when it is confident, otherwise None.
+
+    Updates the parser.local_hit / parser.llm_fallback counters.
+    """
+    parsed, confidence = parse_message(message, now)
+    if parsed is not None and confidence >= LOCAL_PARSE_MIN_CONFIDENCE:
+        metrics.incr("parser.local_hit")
+        return parsed
+    metrics.incr("parser.llm_fallback")
+    return None
+
+
+def parse_expense_locally(message: str, now: datetime = None):
+    """Best-effort parse regardless of confidence, for when the model is unavailable.
+
+    Returns None only when no amount is found.
+    """
+    return parse_message(message, now)[0]
@@ -1,20 +1,91 @@
-from fastapi import FastAPI, HTTPException
+import os
+from dotenv import load_dotenv
+
+# Load settings before the project modules below read their env constants
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Query, Depends
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel
 from datetime import datetime, timezone, timedelta
-import os
-from dotenv import load_dotenv
-from gemini_utils import parse_expense_with_gemini, categorize_expense_with_gemini
+from typing import Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import json
+import functools
+import database
+from database import get_db
+from gemini_utils import (
+    parse_expense_async, categorize_expense_async, parse_and_categorize_async, LLM_SINGLE_SHOT, EXPENSE_CATEGORIES,
+)
+from llm_client import get_llm_client, LLMOverloadedError, LLMTimeoutError, LLMProviderError, LLMCircuitOpenError
 from models import Expense
+import tenancy
+from tenancy import DEFAULT_USER_ID, get_user_id, get_stream_user_id
+import metrics
+from profiling import ProfilingMiddleware, TimedRoute
+from category_cache import category_cache
+import rollups
+from response_cache import response_cache
+import jobs
+from events import event_broker
+from analytics_engine import analytics_engine, AnalyticsUnavailableError, PERIODS
+import indexes
+from pagination import (
+    build_filter, build_projection, encode_cursor, serialize_expense,
+    EXPENSE_SORT, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+)
+from bulk_import import import_rows, iter_csv_rows, iter_ndjson_rows, iter_json_rows
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
-load_dotenv("backend/.env")
+async def migrate_database(db):
+    try:
+        await indexes.ensure_indexes(db, category_cache)
+        await tenancy.migrate_if_needed(db)
+        await rollups.rebuild_if_empty(db.expenses, db.expense_rollups)
+    except Exception as e:
+        logger.warning(f"Could not run database migrations: {e}")
+    
+    if analytics_engine.enabled:
+        await analytics_engine.load(db.expenses)
+    
+    if indexes.EXPLAIN_CHECK:
+        # Deliberately not caught: a bad plan should stop the app from starting
+        await indexes.check_query_plans(db)
 
-app = FastAPI()
+job_workers = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the shared clients, warm them up and run background workers for the app's lifetime"""
+    global job_workers
+    db = get_db()
+    category_cache.attach(db.category_cache)
+    get_llm_client().warmup()
+    await database.warmup()
+    await migrate_database(db)
+    if jobs.JOB_WORKERS > 0:
+        job_workers = jobs.JobWorkerPool(db.parse_jobs, _process_ingest_job)
+        job_workers.start()
+    event_broker.start(db.expenses)
+    try:
+        yield
+    finally:
+        await event_broker.stop()
+        if job_workers is not None:
+            await job_workers.stop()
+            job_workers = None
+        database.close()
+
+app = FastAPI(lifespan=lifespan)
+app.router.route_class = TimedRoute
 
 # CORS setup for frontend communication
 app.add_middleware(
@@ -23,274 +94,585 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
-
-# MongoDB Atlas setup
-mongodb_uri = os.getenv("MONGODB_URI")
-logger.debug(f"Loaded MONGODB_URI: {mongodb_uri}")
-client = AsyncIOMotorClient(mongodb_uri)
-db = client.expense_tracker
+# Added last so it wraps CORS handling too
+app.add_middleware(ProfilingMiddleware)
 
 class ExpenseMessage(BaseModel):
     message: str
 
-@app.post("/parse_expense")
-async def parse_expense(data: ExpenseMessage):
-    parsed_data = parse_expense_with_gemini(data.message)
+async def _parse_message(message: str, user_id: str):
+    """Parse and categorize a message for `user_id`; None if it could not be parsed.
+
+    LLM errors the local parser could not cover propagate to the caller.
+    """
+    if LLM_SINGLE_SHOT:
+        parsed_data = await parse_and_categorize_async(message, user_id)
+    else:
+        parsed_data = await parse_expense_async(message)
     if not parsed_data or "title" not in parsed_data or "amount" not in parsed_data:
-        raise HTTPException(status_code=422, detail="Could not parse expense into valid structure")
+        return None
     
-    # Add smart categorization
-    category = categorize_expense_with_gemini(parsed_data["title"])
-    parsed_data["category"] = category
+    # Add smart categorization (already done by the single-shot call)
+    if "category" not in parsed_data:
+        parsed_data["category"] = await categorize_expense_async(parsed_data["title"], user_id)
+    return parsed_data
+
+@app.post("/parse_expense")
+async def parse_expense(data: ExpenseMessage, user_id: str = Depends(get_user_id)):
+    try:
+        parsed_data = await _parse_message(data.message, user_id)
+    except LLMOverloadedError:
+        raise HTTPException(status_code=503, detail="AI parser is busy, please retry shortly",
+                            headers={"Retry-After": "1"})
+    except LLMCircuitOpenError:
+        retry_after = max(1, int(get_llm_client().breaker.reset_seconds))
+        raise HTTPException(status_code=503, detail="AI parser is unavailable, please retry later",
+                            headers={"Retry-After": str(retry_after)})
+    except LLMTimeoutError:
+        raise HTTPException(status_code=504, detail="AI parser timed out")
+    except LLMProviderError:
+        raise HTTPException(status_code=502, detail="AI parser failed")
+    if parsed_data is None:
+        raise HTTPException(status_code=422, detail="Could not parse expense into valid structure")
     
     return parsed_data
 
-@app.post("/add_expense")
-async def add_expense(expense_data: dict):
-    """Accept expense data as dict to handle both AI and manual entries"""
+async def _process_ingest_job(job):
+    """Job handler: parse the stored message and save the resulting expense for its user"""
+    user_id = job.get("user_id", DEFAULT_USER_ID)
+    parsed_data = await _parse_message(job["message"], user_id)
+    if parsed_data is None:
+        raise ValueError("Could not parse expense into valid structure")
+    # The job id doubles as the expense id, so a retried or twice-claimed job saves one expense
+    expense_doc = await _store_expense(parsed_data, user_id, expense_id=job["_id"])
+    return {"expense_id": str(expense_doc["_id"]), "expense": serialize_expense(dict(expense_doc))}
+
+@app.post("/expenses/ingest", status_code=202)
+async def ingest_expense(data: ExpenseMessage, user_id: str = Depends(get_user_id)):
+    """Accept a natural-language expense immediately and parse it in the background.
+
+    Returns a job id; poll GET /jobs/{job_id} until its status is "done"
+    (the stored expense is in `result`) or "failed".
+    """
+    job_id = await jobs.enqueue(get_db().parse_jobs, {"message": data.message, "user_id": user_id})
+    if job_workers is not None:
+        job_workers.notify()
+    return {"job_id": job_id, "status": jobs.PENDING}
+
+def _format_job(job):
+    return {
+        "job_id": str(job["_id"]),
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "result": job.get("result"),
+        "error": job.get("error"),
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=30), user_id: str = Depends(get_user_id)):
+    """Job status; with `wait`, long-poll up to that many seconds for completion"""
     try:
-        # Extract fields
-        title = expense_data.get("title", "")
-        amount = float(expense_data.get("amount", 0))
-        date_value = expense_data.get("date")
-        category = expense_data.get("category", "Other")
-        
-        # If no category provided, categorize it
-        if not category or category == "Other":
-            category = categorize_expense_with_gemini(title)
-        
-        # Handle date conversion
-        if date_value:
-            if isinstance(date_value, str):
-                try:
-                    # Try different date formats
-                    if 'T' in date_value:
-                        # ISO format
-                        parsed_date = datetime.fromisoformat(date_value.replace('Z', '+00:00'))
-                    else:
-                        # Assume it's a date string, add time
-                        parsed_date = datetime.fromisoformat(date_value + 'T00:00:00+00:00')
-                except ValueError:
-                    # If all parsing fails, use current time
-                    parsed_date = datetime.now(timezone.utc)
-            elif isinstance(date_value, datetime):
-                parsed_date = date_value
-            else:
+        object_id = ObjectId(job_id)
+    except InvalidId:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    deadline = asyncio.get_running_loop().time() + wait
+    while True:
+        job = await get_db().parse_jobs.find_one({"_id": object_id, "user_id": user_id}, {"message": 0})
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job["status"] in (jobs.DONE, jobs.FAILED) or asyncio.get_running_loop().time() >= deadline:
+            return _format_job(job)
+        await asyncio.sleep(0.25)
+
+async def _store_expense(expense_data: dict, user_id: str, expense_id=None) -> dict:
+    """Normalize, categorize and save one expense for `user_id`; returns the stored document.
+
+    Passing `expense_id` makes the save idempotent: if that expense already
+    exists it is returned as is, and only counted if the earlier save never
+    got that far.
+    """
+    # Extract fields
+    title = expense_data.get("title", "")
+    amount = float(expense_data.get("amount", 0))
+    date_value = expense_data.get("date")
+    category = expense_data.get("category", "Other")
+    
+    # If no category provided, categorize it
+    if not category or category == "Other":
+        category = await categorize_expense_async(title, user_id)
+    elif expense_data.get("category_corrected") and category in EXPENSE_CATEGORIES:
+        # The user overrode the categorizer; prefer their choice for this title, for them only
+        await category_cache.set(title, category, source="user", user_id=user_id)
+    
+    # Handle date conversion
+    if date_value:
+        if isinstance(date_value, str):
+            try:
+                # Try different date formats
+                if 'T' in date_value:
+                    # ISO format
+                    parsed_date = datetime.fromisoformat(date_value.replace('Z', '+00:00'))
+                else:
+                    # Assume it's a date string, add time
+                    parsed_date = datetime.fromisoformat(date_value + 'T00:00:00+00:00')
+            except ValueError:
+                # If all parsing fails, use current time
                 parsed_date = datetime.now(timezone.utc)
+        elif isinstance(date_value, datetime):
+            parsed_date = date_value
         else:
             parsed_date = datetime.now(timezone.utc)
-        
-        # Ensure timezone awareness
-        if parsed_date.tzinfo is None:
-            parsed_date = parsed_date.replace(tzinfo=timezone.utc)
-        
-        # Create expense document
-        expense_doc = {
-            "title": title,
-            "amount": amount,
-            "date": parsed_date,
-            "category": category
-        }
-        
-        logger.debug(f"Saving expense: {expense_doc}")
-        
-        # Save to database
-        result = await db.expenses.insert_one(expense_doc)
-        logger.debug(f"Expense saved with ID: {result.inserted_id}")
-        
+    else:
+        parsed_date = datetime.now(timezone.utc)
+    
+    # Ensure timezone awareness
+    if parsed_date.tzinfo is None:
+        parsed_date = parsed_date.replace(tzinfo=timezone.utc)
+    
+    # Create expense document
+    expense_doc = {
+        "user_id": user_id,
+        "title": title,
+        "amount": amount,
+        "date": parsed_date,
+        "category": category
+    }
+    
+    logger.debug("Saving expense: %s", expense_doc)
+    
+    stored_doc = expense_doc
+    if expense_id is not None:
+        expense_doc["_id"] = expense_id
+        # Cleared once the expense is counted, so a retry after a crash in between still counts it
+        stored_doc = {**expense_doc, "counted": False}
+    
+    # Save to database
+    db = get_db()
+    try:
+        result = await db.expenses.insert_one(stored_doc)
+    except DuplicateKeyError:
+        if expense_id is None:
+            raise
+        existing = await db.expenses.find_one({"_id": expense_id})
+        if existing.pop("counted", True):
+            logger.info(f"Expense {expense_id} was already saved, skipping")
+            return existing
+        logger.info(f"Expense {expense_id} was saved but never counted, counting it now")
+        await _on_expenses_inserted([existing], user_id)
+        await db.expenses.update_one({"_id": expense_id}, {"$unset": {"counted": ""}})
+        return existing
+    logger.debug("Expense saved with ID: %s", result.inserted_id)
+    await _on_expenses_inserted([expense_doc], user_id)
+    if stored_doc is not expense_doc:
+        await db.expenses.update_one({"_id": expense_id}, {"$unset": {"counted": ""}})
+    
+    return expense_doc
+
+@app.post("/add_expense")
+async def add_expense(expense_data: dict, user_id: str = Depends(get_user_id)):
+    """Accept expense data as dict to handle both AI and manual entries"""
+    try:
+        await _store_expense(expense_data, user_id)
         return {"message": "Expense added successfully"}
         
     except Exception as e:
         logger.error(f"Error adding expense: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to add expense: {str(e)}")
 
-@app.get("/summary")
-async def get_summary():
-    total_expenses = await db.expenses.aggregate([
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]).to_list(length=1)
+async def _on_expenses_inserted(docs, user_id: str):
+    """Fold freshly inserted expenses into the rollups, caches and live dashboards.
+
+    The expenses are already saved, so a failing step is logged and counted
+    in expenses.post_insert_failed instead of failing the write; rollups
+    that missed an update are repaired by `python backend/rollups.py --rebuild`.
+    """
+    try:
+        await rollups.apply_expenses(get_db().expense_rollups, docs)
+    except Exception as e:
+        logger.error(f"Could not add {len(docs)} expenses to the rollups: {e}")
+        metrics.incr("expenses.post_insert_failed")
+    try:
+        analytics_engine.append(docs)
+    except Exception as e:
+        logger.error(f"Could not add {len(docs)} expenses to the analytics engine: {e}")
+        metrics.incr("expenses.post_insert_failed")
+    await response_cache.invalidate(user_id)
+    event_broker.expenses_added(docs)
+
+@app.post("/expenses/bulk")
+async def add_expenses_bulk(request: Request, user_id: str = Depends(get_user_id)):
+    """Import many expenses at once.
+
+    Accepts a JSON array (application/json), or a streamed CSV (text/csv) or
+    NDJSON (application/x-ndjson) body. Rows are validated individually and
+    reported back with 1-based row numbers when they fail.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "text/csv":
+        rows = iter_csv_rows(request.stream())
+    elif content_type in ("application/x-ndjson", "application/ndjson"):
+        rows = iter_ndjson_rows(request.stream())
+    elif content_type in ("application/json", ""):
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be valid JSON")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of expenses")
+        rows = iter_json_rows(payload)
+    else:
+        raise HTTPException(status_code=415, detail=f"Unsupported content type: {content_type}")
+    
+    try:
+        return await import_rows(get_db().expenses, rows, user_id,
+                                 on_inserted=functools.partial(_on_expenses_inserted, user_id=user_id))
+    except Exception as e:
+        logger.error(f"Error importing expenses: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to import expenses: {str(e)}")
+
+def _format_summary(total_expenses):
     return {"total_expenses": total_expenses[0]["total"] if total_expenses else 0}
 
+async def _compute_summary(user_id: str):
+    total_expenses = await get_db().expense_rollups.aggregate(rollups.summary_pipeline(user_id)).to_list(length=1)
+    return _format_summary(total_expenses)
+
+@app.get("/summary")
+async def get_summary(request: Request, user_id: str = Depends(get_user_id)):
+    return await response_cache.respond(request, "summary", functools.partial(_compute_summary, user_id), user_id)
+
 @app.get("/today_expenses")
-async def get_today_expenses():
+async def get_today_expenses(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    category: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    user_id: str = Depends(get_user_id),
+):
+    """Today's expenses (UTC), newest first; same paging options as /all_expenses"""
     # Get today's date range in UTC
-    now_utc = datetime.now(timezone.utc)
-    today_start = now_utc.replace(hour=0, minute=0, second=0, microsecond=0)
-    tomorrow_start = now_utc.replace(hour=0, minute=0, second=0, microsecond=0)
-    tomorrow_start = tomorrow_start.replace(day=tomorrow_start.day + 1)
-    
-    logger.debug(f"Current UTC time: {now_utc}")
-    logger.debug(f"Today start: {today_start}")
-    logger.debug(f"Tomorrow start: {tomorrow_start}")
-    
-    # Query expenses for today
-    expenses_cursor = db.expenses.find({
-        "date": {
-            "$gte": today_start,
-            "$lt": tomorrow_start
-        }
-    }).sort("date", -1)  # Sort by date descending (newest first)
-    
-    expenses = await expenses_cursor.to_list(length=100)
+    today_start, tomorrow_start = _today_range()
     
-    logger.debug(f"Found {len(expenses)} expenses for today")
-    
-    # Convert ObjectId to string and ensure proper date format for frontend
-    for expense in expenses:
-        if "_id" in expense:
-            expense["_id"] = str(expense["_id"])
-        # Ensure date is properly formatted
-        if isinstance(expense["date"], datetime):
-            expense["date"] = expense["date"].isoformat()
-        # Ensure category exists
-        if "category" not in expense:
-            expense["category"] = "Other"
+    return await _list_expenses(
+        dict(user_id=user_id, start=today_start, end=tomorrow_start, category=category,
+             min_amount=min_amount, max_amount=max_amount, cursor=cursor),
+        limit, fields, format,
+    )
+
+def _format_category_summary(category_totals):
+    # Format the data for charts
+    formatted_data = []
+    for item in category_totals:
+        formatted_data.append({
+            "category": item["_id"] if item["_id"] else "Other",
+            "total": item["total"],
+            "count": item["count"]
+        })
     
-    return expenses
+    return formatted_data
+
+async def _compute_category_summary(user_id: str):
+    # Get category-wise totals
+    category_totals = await get_db().expense_rollups.aggregate(
+        rollups.category_totals_pipeline(user_id)
+    ).to_list(length=100)
+    return _format_category_summary(category_totals)
 
 @app.get("/category_summary")
-async def get_category_summary():
+async def get_category_summary(request: Request, user_id: str = Depends(get_user_id)):
     """Get expense summary by category"""
     try:
-        # Get category-wise totals
-        category_totals = await db.expenses.aggregate([
-            {"$group": {"_id": "$category", "total": {"$sum": "$amount"}, "count": {"$sum": 1}}}
-        ]).to_list(length=100)
-        
-        # Format the data for charts
-        formatted_data = []
-        for item in category_totals:
-            formatted_data.append({
-                "category": item["_id"] if item["_id"] else "Other",
-                "total": item["total"],
-                "count": item["count"]
-            })
-        
-        return formatted_data
-        
+        return await response_cache.respond(request, "category_summary",
+                                            functools.partial(_compute_category_summary, user_id), user_id)
     except Exception as e:
         logger.error(f"Error getting category summary: {e}")
         return []
 
+def _format_monthly_trends(monthly_data):
+    # Format data for charts
+    formatted_data = []
+    for item in monthly_data:
+        month_name = datetime(item["_id"]["year"], item["_id"]["month"], 1).strftime("%b %Y")
+        formatted_data.append({
+            "month": month_name,
+            "total": item["total"],
+            "count": item["count"]
+        })
+    
+    return formatted_data
+
+async def _compute_monthly_trends(user_id: str):
+    # Get data for last 6 months
+    six_months_ago = datetime.now(timezone.utc) - timedelta(days=180)
+    
+    monthly_data = await get_db().expense_rollups.aggregate(
+        rollups.monthly_trends_pipeline(user_id, six_months_ago)
+    ).to_list(length=100)
+    return _format_monthly_trends(monthly_data)
+
 @app.get("/monthly_trends")
-async def get_monthly_trends():
+async def get_monthly_trends(request: Request, user_id: str = Depends(get_user_id)):
     """Get monthly expense trends"""
     try:
-        # Get data for last 6 months
-        six_months_ago = datetime.now(timezone.utc) - timedelta(days=180)
-        
-        monthly_data = await db.expenses.aggregate([
-            {"$match": {"date": {"$gte": six_months_ago}}},
-            {"$group": {
-                "_id": {
-                    "year": {"$year": "$date"},
-                    "month": {"$month": "$date"}
-                },
-                "total": {"$sum": "$amount"},
-                "count": {"$sum": 1}
-            }},
-            {"$sort": {"_id.year": 1, "_id.month": 1}}
-        ]).to_list(length=100)
-        
-        # Format data for charts
-        formatted_data = []
-        for item in monthly_data:
-            month_name = datetime(item["_id"]["year"], item["_id"]["month"], 1).strftime("%b %Y")
-            formatted_data.append({
-                "month": month_name,
-                "total": item["total"],
-                "count": item["count"]
-            })
-        
-        return formatted_data
-        
+        return await response_cache.respond(request, "monthly_trends",
+                                            functools.partial(_compute_monthly_trends, user_id), user_id)
     except Exception as e:
         logger.error(f"Error getting monthly trends: {e}")
         return []
 
+def _format_weekly_trends(weekly_data):
+    # Format data for charts
+    formatted_data = []
+    for i, item in enumerate(weekly_data):
+        formatted_data.append({
+            "week": f"Week {i+1}",
+            # Year and week number, as used by the week_deltas of live updates
+            "key": f"{item['_id']['year']}-{item['_id']['week']:02d}",
+            "total": item["total"],
+            "count": item["count"]
+        })
+    
+    return formatted_data
+
+async def _compute_weekly_trends(user_id: str):
+    four_weeks_ago = datetime.now(timezone.utc) - timedelta(days=28)
+    
+    weekly_data = await get_db().expense_rollups.aggregate(
+        rollups.weekly_trends_pipeline(user_id, four_weeks_ago)
+    ).to_list(length=100)
+    return _format_weekly_trends(weekly_data)
+
 @app.get("/weekly_trends")
-async def get_weekly_trends():
+async def get_weekly_trends(request: Request, user_id: str = Depends(get_user_id)):
     """Get weekly expense trends for last 4 weeks"""
     try:
-        four_weeks_ago = datetime.now(timezone.utc) - timedelta(days=28)
-        
-        weekly_data = await db.expenses.aggregate([
-            {"$match": {"date": {"$gte": four_weeks_ago}}},
-            {"$group": {
-                "_id": {
-                    "week": {"$week": "$date"},
-                    "year": {"$year": "$date"}
-                },
-                "total": {"$sum": "$amount"},
-                "count": {"$sum": 1}
-            }},
-            {"$sort": {"_id.year": 1, "_id.week": 1}}
-        ]).to_list(length=100)
-        
-        # Format data for charts
-        formatted_data = []
-        for i, item in enumerate(weekly_data):
-            formatted_data.append({
-                "week": f"Week {i+1}",
-                "total": item["total"],
-                "count": item["count"]
-            })
-        
-        return formatted_data
-        
+        return await response_cache.respond(request, "weekly_trends",
+                                            functools.partial(_compute_weekly_trends, user_id), user_id)
     except Exception as e:
         logger.error(f"Error getting weekly trends: {e}")
         return []
 
+def _format_top_categories(top_categories):
+    formatted_data = []
+    for item in top_categories:
+        formatted_data.append({
+            "category": item["_id"] if item["_id"] else "Other",
+            "total": item["total"]
+        })
+    
+    return formatted_data
+
+async def _compute_top_categories(user_id: str):
+    top_categories = await get_db().expense_rollups.aggregate(
+        rollups.top_categories_pipeline(user_id, 5)
+    ).to_list(length=5)
+    return _format_top_categories(top_categories)
+
 @app.get("/top_categories")
-async def get_top_categories():
+async def get_top_categories(request: Request, user_id: str = Depends(get_user_id)):
     """Get top 5 categories by spending"""
     try:
-        top_categories = await db.expenses.aggregate([
-            {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
-            {"$sort": {"total": -1}},
-            {"$limit": 5}
-        ]).to_list(length=5)
-        
-        formatted_data = []
-        for item in top_categories:
-            formatted_data.append({
-                "category": item["_id"] if item["_id"] else "Other",
-                "total": item["total"]
-            })
-        
-        return formatted_data
-        
+        return await response_cache.respond(request, "top_categories",
+                                            functools.partial(_compute_top_categories, user_id), user_id)
     except Exception as e:
         logger.error(f"Error getting top categories: {e}")
         return []
 
-@app.get("/all_expenses")
-async def get_all_expenses():
-    """Debug endpoint to see all expenses"""
-    expenses_cursor = db.expenses.find({}).sort("date", -1)
-    expenses = await expenses_cursor.to_list(length=100)
-    
-    logger.debug(f"Total expenses in database: {len(expenses)}")
+async def _compute_dashboard(user_id: str):
+    now = datetime.now(timezone.utc)
+    today_start, tomorrow_start = _today_range()
+    # One $facet pass over the user's rollups for every chart, concurrently with today's list
+    facets, today_expenses = await asyncio.gather(
+        get_db().expense_rollups.aggregate(rollups.dashboard_pipeline(user_id, now)).to_list(length=1),
+        _fetch_expense_page(build_filter(user_id, start=today_start, end=tomorrow_start), None, DEFAULT_PAGE_SIZE),
+    )
+    facets = facets[0] if facets else {}
+    return {
+        "summary": _format_summary(facets.get("summary", [])),
+        "category_summary": _format_category_summary(facets.get("category_summary", [])),
+        "top_categories": _format_top_categories(facets.get("top_categories", [])),
+        "monthly_trends": _format_monthly_trends(facets.get("monthly_trends", [])),
+        "weekly_trends": _format_weekly_trends(facets.get("weekly_trends", [])),
+        "today_expenses": today_expenses,
+    }
+
+@app.get("/dashboard")
+async def get_dashboard(request: Request, user_id: str = Depends(get_user_id)):
+    """Everything the dashboard shows, in one request"""
+    try:
+        return await response_cache.respond(request, "dashboard", functools.partial(_compute_dashboard, user_id),
+                                            user_id)
+    except Exception as e:
+        logger.error(f"Error getting dashboard: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load dashboard")
+
+@app.get("/events")
+async def stream_events(user_id: str = Depends(get_stream_user_id)):
+    """Server-sent dashboard deltas after each of the user's writes; see events.py for the event types"""
+    return StreamingResponse(event_broker.stream(user_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _analytics_store(user_id: str = Depends(get_user_id)):
+    """Dependency returning the user's column store"""
+    try:
+        return analytics_engine.require(user_id)
+    except AnalyticsUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/analytics/categories")
+async def get_analytics_categories(since: Optional[datetime] = None, store=Depends(_analytics_store)):
+    """Category totals from the in-memory analytics engine"""
+    return store.category_totals(since)
+
+@app.get("/analytics/percentiles")
+async def get_analytics_percentiles(q: str = "50,90,99", category: Optional[str] = None,
+                                    since: Optional[datetime] = None, store=Depends(_analytics_store)):
+    """Amount percentiles, e.g. q=50,90,99"""
+    try:
+        quantiles = [float(value) for value in q.split(",")]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="q must be a comma-separated list of numbers")
+    if any(not 0 <= value <= 100 for value in quantiles):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100")
+    return store.percentiles(quantiles, category, since)
+
+@app.get("/analytics/trends")
+async def get_analytics_trends(period: str = Query("month", pattern=f"^({'|'.join(PERIODS)})$"),
+                               since: Optional[datetime] = None, category: Optional[str] = None,
+                               store=Depends(_analytics_store)):
+    """Totals per day, week, month or year"""
+    return store.trends(period, since, category)
+
+@app.get("/analytics/rolling")
+async def get_analytics_rolling(window: int = Query(7, ge=1, le=366), days: int = Query(90, ge=1, le=3660),
+                                category: Optional[str] = None, store=Depends(_analytics_store)):
+    """Daily totals for the last `days` days with a trailing `window`-day sum"""
+    today_start, _ = _today_range()
+    return store.rolling(window, today_start - timedelta(days=days - 1), category)
+
+@app.get("/analytics/heatmap")
+async def get_analytics_heatmap(since: Optional[datetime] = None, category: Optional[str] = None,
+                                store=Depends(_analytics_store)):
+    """Spend by weekday (Monday first) and UTC hour"""
+    return store.weekday_heatmap(since, category)
+
+def _today_range():
+    """[start of today, start of tomorrow) in UTC"""
+    today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today_start, today_start + timedelta(days=1)
+
+async def _fetch_expense_page(query: dict, projection: Optional[dict], page_size: int, fill_category: bool = True):
+    # Fetch one extra row to learn whether another page exists
+    expenses = await get_db().expenses.find(query, projection).sort(EXPENSE_SORT).to_list(length=page_size + 1)
+    next_cursor = encode_cursor(expenses[page_size - 1]) if len(expenses) > page_size else None
+    items = [serialize_expense(expense, fill_category) for expense in expenses[:page_size]]
+    return {"items": items, "next_cursor": next_cursor}
+
+async def _list_expenses(filter_args: dict, limit: Optional[int], fields: Optional[str], format: str):
+    """Keyset-paginated expense listing shared by /all_expenses and /today_expenses.
+
+    JSON responses hold one page plus a `next_cursor` token (null on the last
+    page). NDJSON responses stream every matching row, or `limit` rows, straight
+    from the Motor cursor.
+    """
+    try:
+        query = build_filter(**filter_args)
+        projection = build_projection(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    fill_category = projection is None or "category" in projection
     
-    for expense in expenses:
-        if "_id" in expense:
-            expense["_id"] = str(expense["_id"])
-        # Ensure date is properly formatted
-        if isinstance(expense["date"], datetime):
-            expense["date"] = expense["date"].isoformat()
-        # Ensure category exists
-        if "category" not in expense:
-            expense["category"] = "Other"
-        logger.debug(f"Expense: {expense['title']} - Date: {expense['date']} - Amount: {expense['amount']} - Category: {expense['category']}")
+    if format == "ndjson":
+        expenses_cursor = get_db().expenses.find(query, projection).sort(EXPENSE_SORT).batch_size(500)
+        if limit:
+            expenses_cursor = expenses_cursor.limit(limit)
+        
+        async def stream_rows():
+            async for expense in expenses_cursor:
+                yield json.dumps(serialize_expense(expense, fill_category)) + "\n"
+        
+        return StreamingResponse(stream_rows(), media_type="application/x-ndjson")
     
-    return expenses
+    return JSONResponse(await _fetch_expense_page(query, projection, limit or DEFAULT_PAGE_SIZE, fill_category))
+
+@app.get("/all_expenses")
+async def get_all_expenses(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    category: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    user_id: str = Depends(get_user_id),
+):
+    """List the user's expenses newest first.
+
+    Pages hold `limit` rows (default 100); pass the returned `next_cursor` back
+    as `cursor` for the next page. `fields` is a comma-separated projection;
+    `start`/`end`, `category` and `min_amount`/`max_amount` filter the rows.
+    Use format=ndjson to stream a full export.
+    """
+    return await _list_expenses(
+        dict(user_id=user_id, start=start, end=end, category=category,
+             min_amount=min_amount, max_amount=max_amount, cursor=cursor),
+        limit, fields, format,
+    )
+
+@app.get("/stats")
+async def get_stats():
+    """LLM pool load and hot-path counters"""
+    return {
+        "llm": get_llm_client().stats,
+        "categorizer": {
+            "local_hits": metrics.get("categorizer.local_hit"),
+            "llm_fallbacks": metrics.get("categorizer.llm_fallback"),
+            "local_hit_rate": metrics.ratio("categorizer.local_hit", "categorizer.llm_fallback"),
+        },
+        "parser": {
+            "local_hits": metrics.get("parser.local_hit"),
+            "llm_fallbacks": metrics.get("parser.llm_fallback"),
+            "local_hit_rate": metrics.ratio("parser.local_hit", "parser.llm_fallback"),
+        },
+        "category_cache": category_cache.stats,
+        "response_cache": response_cache.stats,
+        "events": {
+            "source": event_broker.source,
+            "subscribers": event_broker.subscribers,
+            "published": metrics.get("events.published"),
+            "resyncs": metrics.get("events.resync"),
+        },
+        "counters": metrics.snapshot(),
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Counters, pool gauges and latency histograms in the Prometheus text format"""
+    llm_stats = get_llm_client().stats
+    gauges = {
+        "llm.in_flight": llm_stats["in_flight"],
+        "llm.pending": llm_stats["pending"],
+        "events.subscribers": event_broker.subscribers,
+    }
+    return PlainTextResponse(metrics.render_prometheus(gauges), media_type="text/plain; version=0.0.4")
 
 @app.delete("/clear_expenses")
-async def clear_all_expenses():
-    """Debug endpoint to clear all expenses"""
-    result = await db.expenses.delete_many({})
+async def clear_all_expenses(user_id: str = Depends(get_user_id)):
+    """Debug endpoint to clear all of the user's expenses"""
+    db = get_db()
+    result = await db.expenses.delete_many({"user_id": user_id})
+    await rollups.clear(db.expense_rollups, user_id)
+    analytics_engine.clear(user_id)
+    await response_cache.invalidate(user_id)
+    event_broker.expenses_cleared(user_id)
     return {"message": f"Deleted {result.deleted_count} expenses"}
 
 if __name__ == "__main__":
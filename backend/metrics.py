@@ -0,0 +1,92 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+# Process-local counters for cheap hot-path instrumentation
+_counters = defaultdict(int)
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> label tuple -> per-bucket counts (last one is +Inf) followed by the sum
+_histograms = defaultdict(dict)
+# Mongo command timings arrive from Motor's executor threads
+_histogram_lock = threading.Lock()
+
+PROMETHEUS_PREFIX = "expense_tracker_"
+_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def incr(name: str, amount: int = 1):
+    _counters[name] += amount
+
+
+def get(name: str) -> int:
+    return _counters.get(name, 0)
+
+
+def ratio(hits: str, misses: str) -> float:
+    """Share of `hits` among `hits + misses`, 0 when neither has been counted"""
+    total = get(hits) + get(misses)
+    return get(hits) / total if total else 0.0
+
+
+def observe(name: str, seconds: float, **labels):
+    """Add one observation to the latency histogram `name`"""
+    key = tuple(sorted(labels.items()))
+    index = bisect_left(LATENCY_BUCKETS, seconds)
+    with _histogram_lock:
+        series = _histograms[name].get(key)
+        if series is None:
+            series = _histograms[name][key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        series[index] += 1
+        series[-1] += seconds
+
+
+def snapshot() -> dict:
+    return dict(_counters)
+
+
+def _metric_name(name: str) -> str:
+    return PROMETHEUS_PREFIX + _NAME_RE.sub("_", name)
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus(gauges: dict = None) -> str:
+    """Counters, histograms and the given gauges in the Prometheus text format"""
+    lines = []
+    for name, value in sorted(_counters.items()):
+        metric = _metric_name(name) + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    for name, value in sorted((gauges or {}).items()):
+        metric = _metric_name(name)
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    with _histogram_lock:
+        histograms = {name: {key: list(series) for key, series in by_labels.items()}
+                      for name, by_labels in _histograms.items()}
+    for name, by_labels in sorted(histograms.items()):
+        metric = _metric_name(name)
+        lines.append(f"# TYPE {metric} histogram")
+        for key, series in sorted(by_labels.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), series):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_labels(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{metric}_sum{_labels(key)} {series[-1]}")
+            lines.append(f"{metric}_count{_labels(key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    _counters.clear()
+    with _histogram_lock:
+        _histograms.clear()
@@ -3,10 +3,14 @@ from datetime import datetime
 from typing import Optional, Union
 
 class Expense(BaseModel):
+    # Owner of the expense; always taken from the request, never from the payload
+    user_id: Optional[str] = None
     title: str
     amount: float
     date: Optional[Union[datetime, str]] = None
     category: Optional[str] = "Other"
+    # Set by clients when the user chose the category over the categorizer's answer
+    category_corrected: bool = False
     
     @validator('date', pre=True)
     def parse_date(cls, v):
@@ -0,0 +1,105 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Newest first; _id breaks ties between expenses with the same timestamp
+EXPENSE_SORT = [("date", -1), ("_id", -1)]
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Fields a client may ask for; date and _id are always returned because the
+# cursor is built from them
+EXPENSE_FIELDS = {"title", "amount", "date", "category"}
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(doc) -> str:
+    date = doc["date"]
+    payload = {"d": date.isoformat() if isinstance(date, datetime) else date, "i": str(doc["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    """Return the (date, ObjectId) position encoded in a cursor token"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        date = datetime.fromisoformat(payload["d"])
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        return date, ObjectId(payload["i"])
+    except (binascii.Error, ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursorError(f"Invalid cursor: {e}")
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def build_filter(user_id: str, start: datetime = None, end: datetime = None, category: str = None,
+                 min_amount: float = None, max_amount: float = None, cursor: str = None) -> dict:
+    """Mongo filter for one user's expense listing; `start` is inclusive, `end` exclusive"""
+    clauses = [{"user_id": user_id}]
+    date_range = {}
+    if start is not None:
+        date_range["$gte"] = _as_utc(start)
+    if end is not None:
+        date_range["$lt"] = _as_utc(end)
+    if date_range:
+        clauses.append({"date": date_range})
+    if category:
+        clauses.append({"category": category})
+    amount_range = {}
+    if min_amount is not None:
+        amount_range["$gte"] = min_amount
+    if max_amount is not None:
+        amount_range["$lte"] = max_amount
+    if amount_range:
+        clauses.append({"amount": amount_range})
+    if cursor:
+        date, object_id = decode_cursor(cursor)
+        clauses.append({"$or": [
+            {"date": {"$lt": date}},
+            {"date": date, "_id": {"$lt": object_id}},
+        ]})
+
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
+def build_projection(fields: str = None):
+    """Projection for a comma-separated field list, or None for whole documents"""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - EXPENSE_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    projection = {name: 1 for name in requested}
+    projection["date"] = 1
+    return projection
+
+
+def serialize_expense(expense: dict, fill_category: bool = True) -> dict:
+    """Make an expense document JSON-ready for the frontend"""
+    if "_id" in expense:
+        expense["_id"] = str(expense["_id"])
+    # The owner is implied by the request; the counted marker is internal
+    expense.pop("user_id", None)
+    expense.pop("counted", None)
+    # Ensure date is properly formatted
+    if isinstance(expense.get("date"), datetime):
+        expense["date"] = expense["date"].isoformat()
+    # Ensure category exists
+    if fill_category and "category" not in expense:
+        expense["category"] = "Other"
+    return expense
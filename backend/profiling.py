@@ -0,0 +1,230 @@
+"""Per-request stage timings, exported as Server-Timing headers and histograms.
+
+ProfilingMiddleware times every request and answers with the per-stage
+totals, e.g.
+
+    Server-Timing: llm;dur=412.0, llm_json;dur=0.3, mongo;dur=6.3, encode;dur=0.8, total;dur=421.5
+
+Stages come from `stage()` blocks (model calls, JSON cleanup), from
+MongoCommandTimer on the Motor client (every command round trip) and from
+TimedRoute (endpoint return to response start, i.e. serialization). Every
+observation also feeds the stage_duration_seconds histogram on GET /metrics,
+next to http_request_duration_seconds per route.
+
+Profiling is opt-in. With PROFILE_TOKEN set, a request carrying
+`X-Profile: <token>` is profiled; PROFILE_SAMPLE_RATE profiles that share
+of all requests. Profiles go to PROFILE_DIR and are named in the
+X-Profile-File response header. PROFILER=pyinstrument (when installed)
+follows the request across awaits; cProfile also records whatever else the
+event loop runs meanwhile. Only one request is profiled at a time.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILER = os.getenv("PROFILER", "cprofile").lower()
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Long-lived responses are never sampled
+PROFILE_EXCLUDED_PATHS = {"/events", "/metrics"}
+
+_current = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Stage totals for one request; Mongo timings are added from executor threads"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.endpoint_returned = None
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self, now: float) -> str:
+        with self._lock:
+            parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        parts.append(f"total;dur={(now - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def record(stage: str, seconds: float):
+    """Count `seconds` towards `stage` in the histogram and the current request"""
+    metrics.observe("stage_duration_seconds", seconds, stage=stage)
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Times every MongoDB command; Motor runs them with the caller's context"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record("mongo", event.duration_micros / 1e6)
+
+    def failed(self, event):
+        record("mongo", event.duration_micros / 1e6)
+
+
+def _mark_returned(endpoint):
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _endpoint_returned()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _endpoint_returned()
+    return wrapper
+
+
+def _endpoint_returned():
+    timings = _current.get()
+    if timings is not None:
+        timings.endpoint_returned = time.perf_counter()
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that notes when the endpoint returns, so the rest of the handler counts as encoding"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _mark_returned(endpoint), **kwargs)
+
+
+class _Profile:
+    """One running cProfile or pyinstrument session, written out by finish()"""
+
+    active = False
+
+    def __init__(self, scope):
+        slug = scope["path"].strip("/").replace("/", "_") or "root"
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        self.kind = PROFILER
+        if self.kind == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+                self._profiler = Profiler(async_mode="enabled")
+            except ImportError:
+                logger.warning("PROFILER=pyinstrument but pyinstrument is not installed; using cProfile")
+                self.kind = "cprofile"
+        if self.kind != "pyinstrument":
+            import cProfile
+            self._profiler = cProfile.Profile()
+        extension = "html" if self.kind == "pyinstrument" else "prof"
+        self.filename = f"{stamp}-{os.getpid()}-{scope['method']}-{slug}-{random.getrandbits(16):04x}.{extension}"
+        _Profile.active = True
+        if self.kind == "cprofile":
+            self._profiler.enable()
+        else:
+            self._profiler.start()
+
+    async def finish(self):
+        try:
+            if self.kind == "cprofile":
+                self._profiler.disable()
+            else:
+                self._profiler.stop()
+        finally:
+            _Profile.active = False
+        await asyncio.to_thread(self._write)
+
+    def _write(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, self.filename)
+        if self.kind == "cprofile":
+            self._profiler.dump_stats(path)
+        else:
+            with open(path, "w", encoding="utf-8") as output:
+                output.write(self._profiler.output_html())
+        metrics.incr("profiler.profiles")
+        logger.info(f"Wrote request profile {path}")
+
+
+def _wants_profile(scope) -> bool:
+    if _Profile.active:
+        return False
+    if PROFILE_TOKEN:
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return value.decode("latin-1") == PROFILE_TOKEN
+    return (PROFILE_SAMPLE_RATE > 0 and scope["path"] not in PROFILE_EXCLUDED_PATHS
+            and random.random() < PROFILE_SAMPLE_RATE)
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware, so streaming responses and context variables pass through untouched"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        profile = _Profile(scope) if _wants_profile(scope) else None
+        status = 500
+
+        async def send_with_timings(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                now = time.perf_counter()
+                if timings.endpoint_returned is not None:
+                    record("encode", now - timings.endpoint_returned)
+                headers = list(message.get("headers", []))
+                if SERVER_TIMING:
+                    headers.append((b"server-timing", timings.server_timing(now).encode("latin-1")))
+                if profile is not None:
+                    headers.append((b"x-profile-file", profile.filename.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            metrics.observe("http_request_duration_seconds", time.perf_counter() - timings.started,
+                            method=scope["method"], route=route.path if route else "unmatched",
+                            status=str(status))
+            if profile is not None:
+                await profile.finish()
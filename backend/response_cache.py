@@ -0,0 +1,151 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+
+from fastapi import Request, Response
+
+import metrics
+from category_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# "memory" (per process), "redis" (shared between workers) or "none"
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class MemoryBackend:
+    """Per-process backend; each uvicorn worker keeps its own entries and versions"""
+
+    def __init__(self, max_size: int = RESPONSE_CACHE_MAX_SIZE, ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS):
+        self._entries = LRUCache(max_size, ttl_seconds)
+        # One small int per user who has written; never evicted, or stale entries could match again
+        self._versions = {}
+
+    async def get(self, key: str):
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: bytes):
+        self._entries.set(key, value)
+
+    async def get_version(self, user_id: str) -> int:
+        return self._versions.get(user_id, 0)
+
+    async def bump_version(self, user_id: str):
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+
+class RedisBackend:
+    """Backend on any Redis-compatible server, shared by every worker (needs the redis package)"""
+
+    def __init__(self, url: str = REDIS_URL, ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS,
+                 prefix: str = "expense_tracker:response_cache"):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    async def get(self, key: str):
+        return await self._redis.get(f"{self.prefix}:{key}")
+
+    async def set(self, key: str, value: bytes):
+        await self._redis.set(f"{self.prefix}:{key}", value, ex=self.ttl_seconds)
+
+    async def get_version(self, user_id: str) -> int:
+        return int(await self._redis.get(f"{self.prefix}:version:{user_id}") or 0)
+
+    async def bump_version(self, user_id: str):
+        await self._redis.incr(f"{self.prefix}:version:{user_id}")
+
+
+def _make_backend(name: str):
+    if name == "none":
+        return None
+    if name == "redis":
+        return RedisBackend()
+    return MemoryBackend()
+
+
+class ResponseCache:
+    """Caches JSON responses of read-only endpoints until the user's next write.
+
+    Keys combine the user, their data version (bumped on each of their
+    writes, so one user's writes leave everyone else's entries alone), the
+    endpoint, its query parameters and the current UTC date, since several
+    analytics windows are relative to today. Responses carry a content ETag
+    and If-None-Match requests get a bodiless 304.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def invalidate(self, user_id: str):
+        """Make every cached response of `user_id` stale; call after each of their writes"""
+        if self.backend is None:
+            return
+        try:
+            await self.backend.bump_version(user_id)
+        except Exception as e:
+            logger.error(f"Could not invalidate response cache: {e}")
+
+    async def _key(self, request: Request, name: str, user_id: str) -> str:
+        version = await self.backend.get_version(user_id)
+        params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        today = datetime.now(timezone.utc).date().isoformat()
+        return f"{user_id}:{version}:{name}:{params}:{today}"
+
+    async def respond(self, request: Request, name: str, compute, user_id: str) -> Response:
+        """Serve `user_id`'s `name` from the cache, or await `compute()` and cache its result.
+
+        Exceptions from `compute` propagate and nothing is cached.
+        """
+        entry = None
+        key = None
+        if self.backend is not None:
+            try:
+                key = await self._key(request, name, user_id)
+                entry = await self.backend.get(key)
+            except Exception as e:
+                logger.warning(f"Response cache lookup failed: {e}")
+
+        if entry is not None:
+            metrics.incr("response_cache.hit")
+            etag, body = entry.split(b"\n", 1)
+            etag = etag.decode()
+        else:
+            metrics.incr("response_cache.miss")
+            body = json.dumps(await compute()).encode()
+            etag = f'"{hashlib.sha1(body).hexdigest()}"'
+            if key is not None:
+                try:
+                    await self.backend.set(key, etag.encode() + b"\n" + body)
+                except Exception as e:
+                    logger.warning(f"Response cache write failed: {e}")
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in request.headers.get("if-none-match", ""):
+            metrics.incr("response_cache.not_modified")
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    @property
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "hits": metrics.get("response_cache.hit"),
+            "misses": metrics.get("response_cache.miss"),
+            "not_modified": metrics.get("response_cache.not_modified"),
+            "hit_rate": metrics.ratio("response_cache.hit", "response_cache.miss"),
+        }
+
+
+response_cache = ResponseCache(_make_backend(RESPONSE_CACHE_BACKEND))
@@ -0,0 +1,184 @@
+"""Per-user day x category rollups of the expenses collection.
+
+Each rollup document holds the sum, count, min and max of the amounts for
+one (user, day, category) triple. Writes keep it current incrementally and
+the analytics endpoints read one user's buckets instead of scanning their
+expenses.
+
+Rebuild from scratch with:
+    python backend/rollups.py --rebuild
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone, timedelta
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def day_bucket(value: datetime) -> datetime:
+    """Midnight UTC of the day `value` falls on"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+
+
+async def ensure_indexes(rollups):
+    await rollups.create_index([("user_id", 1), ("day", 1), ("category", 1)], unique=True)
+
+
+async def apply_expenses(rollups, docs, sign: int = 1):
+    """Fold expense documents into the rollups.
+
+    Use sign=-1 for deletions; sums and counts are exact, but min/max are
+    only widened, so run rebuild() after large deletes if they matter.
+    """
+    groups = defaultdict(lambda: {"sum": 0.0, "count": 0, "min": None, "max": None})
+    for doc in docs:
+        group = groups[(doc["user_id"], day_bucket(doc["date"]), doc.get("category") or "Other")]
+        amount = doc["amount"]
+        group["sum"] += amount
+        group["count"] += 1
+        group["min"] = amount if group["min"] is None else min(group["min"], amount)
+        group["max"] = amount if group["max"] is None else max(group["max"], amount)
+
+    operations = []
+    for (user_id, day, category), group in groups.items():
+        update = {"$inc": {"sum": sign * group["sum"], "count": sign * group["count"]}}
+        if sign > 0:
+            update["$min"] = {"min": group["min"]}
+            update["$max"] = {"max": group["max"]}
+        operations.append(UpdateOne({"user_id": user_id, "day": day, "category": category}, update, upsert=True))
+    if not operations:
+        return
+
+    try:
+        await rollups.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # Two writers can race to upsert the same new bucket; the loser is
+        # rejected by the unique index and simply needs to update instead.
+        retry = [operations[error["index"]] for error in e.details.get("writeErrors", [])
+                 if error.get("code") == DUPLICATE_KEY_ERROR]
+        if len(retry) != len(e.details.get("writeErrors", [])):
+            raise
+        await rollups.bulk_write(retry, ordered=False)
+
+
+async def clear(rollups, user_id: str = None):
+    """Delete one user's rollups, or every rollup when `user_id` is None"""
+    await rollups.delete_many({} if user_id is None else {"user_id": user_id})
+
+
+async def rebuild(expenses, rollups):
+    """Recompute every rollup from the expenses collection"""
+    await clear(rollups)
+    await expenses.aggregate([
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "day": {"$dateTrunc": {"date": "$date", "unit": "day", "timezone": "UTC"}},
+                "category": {"$ifNull": ["$category", "Other"]},
+            },
+            "sum": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+            "min": {"$min": "$amount"},
+            "max": {"$max": "$amount"},
+        }},
+        {"$project": {
+            "_id": 0,
+            "user_id": "$_id.user_id",
+            "day": "$_id.day",
+            "category": "$_id.category",
+            "sum": 1, "count": 1, "min": 1, "max": 1,
+        }},
+        {"$merge": {"into": rollups.name, "on": ["user_id", "day", "category"], "whenMatched": "replace"}},
+    ]).to_list(length=None)
+
+
+async def rebuild_if_empty(expenses, rollups):
+    """Backfill rollups for databases that already hold expenses"""
+    if await rollups.estimated_document_count() == 0 and await expenses.estimated_document_count() > 0:
+        logger.info("Rollup collection is empty, rebuilding from expenses")
+        await rebuild(expenses, rollups)
+
+
+# Pipelines over one user's rollups, mirroring the original expense pipelines.
+# user_id=None leaves out the $match, for use under an already scoped $facet.
+
+def _match(user_id: str, **conditions):
+    if user_id is not None:
+        conditions = {"user_id": user_id, **conditions}
+    return [{"$match": conditions}] if conditions else []
+
+
+def summary_pipeline(user_id: str):
+    return _match(user_id) + [{"$group": {"_id": None, "total": {"$sum": "$sum"}}}]
+
+
+def category_totals_pipeline(user_id: str):
+    return _match(user_id) + [
+        {"$group": {"_id": "$category", "total": {"$sum": "$sum"}, "count": {"$sum": "$count"}}},
+    ]
+
+
+def top_categories_pipeline(user_id: str, limit: int = 5):
+    return _match(user_id) + [
+        {"$group": {"_id": "$category", "total": {"$sum": "$sum"}}},
+        {"$sort": {"total": -1}},
+        {"$limit": limit},
+    ]
+
+
+def monthly_trends_pipeline(user_id: str, since: datetime):
+    return _match(user_id, day={"$gte": day_bucket(since)}) + [
+        {"$group": {
+            "_id": {"year": {"$year": "$day"}, "month": {"$month": "$day"}},
+            "total": {"$sum": "$sum"},
+            "count": {"$sum": "$count"},
+        }},
+        {"$sort": {"_id.year": 1, "_id.month": 1}},
+    ]
+
+
+def weekly_trends_pipeline(user_id: str, since: datetime):
+    return _match(user_id, day={"$gte": day_bucket(since)}) + [
+        {"$group": {
+            "_id": {"week": {"$week": "$day"}, "year": {"$year": "$day"}},
+            "total": {"$sum": "$sum"},
+            "count": {"$sum": "$count"},
+        }},
+        {"$sort": {"_id.year": 1, "_id.week": 1}},
+    ]
+
+
+def dashboard_pipeline(user_id: str, now: datetime):
+    """Every analytics pipeline above as one $facet over the user's buckets, for a single round-trip"""
+    return _match(user_id) + [{"$facet": {
+        "summary": summary_pipeline(None),
+        "category_summary": category_totals_pipeline(None),
+        "top_categories": top_categories_pipeline(None, 5),
+        "monthly_trends": monthly_trends_pipeline(None, now - timedelta(days=180)),
+        "weekly_trends": weekly_trends_pipeline(None, now - timedelta(days=28)),
+    }}]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import database
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="recompute all rollups from expenses")
+    args = parser.parse_args()
+
+    async def _main(db):
+        await ensure_indexes(db.expense_rollups)
+        if args.rebuild:
+            await rebuild(db.expenses, db.expense_rollups)
+            print(f"Rebuilt {await db.expense_rollups.count_documents({})} rollup documents")
+
+    database.run_cli(_main)
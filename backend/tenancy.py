@@ -0,0 +1,97 @@
+"""Tenant identity and the migration to per-user data.
+
+Every expense, rollup bucket and parse job carries a `user_id`, and every
+endpoint query is scoped to the caller's. The caller is identified by the
+X-User-Id header, which is expected to be set by an authenticating proxy
+in front of the API. Without REQUIRE_USER_ID, requests that omit it act as
+DEFAULT_USER_ID, which is also the owner of documents written before
+tenancy existed.
+
+Startup assigns those documents to DEFAULT_USER_ID and rebuilds the
+rollups when it finds any; to do it ahead of a deploy, or for another
+owner, run:
+    python backend/tenancy.py --migrate [--user-id ID]
+"""
+import os
+import re
+import logging
+from typing import Optional
+
+from fastapi import Header, HTTPException, Query
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_ID = os.getenv("DEFAULT_USER_ID", "default")
+# Reject requests without X-User-Id instead of treating them as DEFAULT_USER_ID
+REQUIRE_USER_ID = os.getenv("REQUIRE_USER_ID", "false").lower() in ("1", "true", "yes")
+
+_USER_ID_RE = re.compile(r"^[A-Za-z0-9_.@:-]{1,128}$")
+
+
+def _resolve(user_id: Optional[str]) -> str:
+    if not user_id:
+        if REQUIRE_USER_ID:
+            raise HTTPException(status_code=401, detail="X-User-Id header is required")
+        return DEFAULT_USER_ID
+    if not _USER_ID_RE.match(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user id")
+    return user_id
+
+
+def get_user_id(x_user_id: Optional[str] = Header(None)) -> str:
+    """Dependency returning the tenant of the current request"""
+    return _resolve(x_user_id)
+
+
+def get_stream_user_id(x_user_id: Optional[str] = Header(None), user_id: Optional[str] = Query(None)) -> str:
+    """Like get_user_id, but also reads ?user_id= since EventSource cannot send headers.
+
+    The query parameter is unauthenticated, so with REQUIRE_USER_ID it is
+    ignored and the proxy must set X-User-Id on /events like on any request.
+    """
+    if REQUIRE_USER_ID:
+        return _resolve(x_user_id)
+    return _resolve(x_user_id or user_id)
+
+
+async def migrate(db, user_id: str = DEFAULT_USER_ID) -> dict:
+    """Give unowned expenses and jobs to `user_id`, then rebuild the per-user rollups"""
+    import indexes
+    import rollups
+
+    await indexes.ensure_indexes(db)
+    expenses = await db.expenses.update_many({"user_id": {"$exists": False}}, {"$set": {"user_id": user_id}})
+    jobs = await db.parse_jobs.update_many({"user_id": {"$exists": False}}, {"$set": {"user_id": user_id}})
+    await rollups.rebuild(db.expenses, db.expense_rollups)
+    logger.info(f"Assigned {expenses.modified_count} expenses and {jobs.modified_count} jobs to {user_id}")
+    return {"expenses": expenses.modified_count, "jobs": jobs.modified_count}
+
+
+async def migrate_if_needed(db):
+    """Run migrate() when expenses written before tenancy are still unowned"""
+    if await db.expenses.find_one({"user_id": {"$exists": False}}, {"_id": 1}) is not None:
+        logger.info(f"Found expenses without a user_id, assigning them to {DEFAULT_USER_ID}")
+        await migrate(db)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import database
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--migrate", action="store_true", help="assign unowned documents and rebuild rollups")
+    parser.add_argument("--user-id", help="owner of documents without a user_id (default: DEFAULT_USER_ID)")
+    args = parser.parse_args()
+
+    async def _main(db):
+        if not args.migrate:
+            parser.print_help()
+            return
+        # Read here rather than from the module constant, which predates loading .env
+        user_id = args.user_id or os.getenv("DEFAULT_USER_ID", DEFAULT_USER_ID)
+        counts = await migrate(db, user_id)
+        print(f"Assigned {counts['expenses']} expenses and {counts['jobs']} jobs to {user_id}; "
+              f"rollups rebuilt")
+
+    database.run_cli(_main)
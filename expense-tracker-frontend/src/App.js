@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { PlusCircle, DollarSign, Calendar, TrendingUp, Send, Sparkles, Receipt, AlertCircle, BarChart3, PieChart, Tag } from 'lucide-react';
 import { PieChart as RechartsPieChart, Pie, Cell, ResponsiveContainer, BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Legend, LineChart, Line } from 'recharts';
 import './App.css';
@@ -22,8 +22,13 @@ const App = () => {
   const [monthlyData, setMonthlyData] = useState([]);
   const [weeklyData, setWeeklyData] = useState([]);
   const [topCategories, setTopCategories] = useState([]);
+  const [categoriesChanged, setCategoriesChanged] = useState(false);
 
   const API_BASE = 'http://localhost:8000';
+  // How long to wait for the live event of our own write before refetching
+  const WRITE_EVENT_TIMEOUT_MS = 2000;
+  const eventsRef = useRef(null);
+  const lastEventAtRef = useRef(0);
 
   // Predefined categories for manual entry
   const EXPENSE_CATEGORIES = [
@@ -41,51 +46,133 @@ const App = () => {
   ];
 
   useEffect(() => {
-    fetchTodayExpenses();
-    fetchSummary();
-    fetchChartData();
+    fetchDashboard();
+
+    // Live deltas from /events keep the dashboard current without refetching
+    const source = new EventSource(`${API_BASE}/events`);
+    let connectedBefore = false;
+    source.onopen = () => {
+      // Catch up on anything written while we were disconnected
+      if (connectedBefore) fetchDashboard();
+      connectedBefore = true;
+    };
+    source.addEventListener('expenses', (event) => {
+      lastEventAtRef.current = Date.now();
+      applyExpenseDelta(JSON.parse(event.data));
+    });
+    source.addEventListener('resync', () => {
+      lastEventAtRef.current = Date.now();
+      fetchDashboard();
+    });
+    source.addEventListener('cleared', () => {
+      lastEventAtRef.current = Date.now();
+      setExpenses([]);
+      setTotalExpenses(0);
+      setCategoryData([]);
+      setMonthlyData([]);
+      setWeeklyData([]);
+      setTopCategories([]);
+    });
+    eventsRef.current = source;
+
+    return () => source.close();
   }, []);
 
-  const fetchTodayExpenses = async () => {
-    try {
-      const response = await fetch(`${API_BASE}/today_expenses`);
-      const data = await response.json();
-      setExpenses(data);
-    } catch (error) {
-      console.error('Error fetching expenses:', error);
+  // After our own writes, rely on the live stream when it is connected, but
+  // refetch if no event arrives in time (e.g. the write was served by
+  // another server worker than our stream)
+  const refreshAfterWrite = (writeStartedAt) => {
+    if (!eventsRef.current || eventsRef.current.readyState !== EventSource.OPEN) {
+      fetchDashboard();
+      return;
     }
+    setTimeout(() => {
+      if (lastEventAtRef.current < writeStartedAt) fetchDashboard();
+    }, WRITE_EVENT_TIMEOUT_MS);
   };
 
-  const fetchSummary = async () => {
-    try {
-      const response = await fetch(`${API_BASE}/summary`);
-      const data = await response.json();
-      setTotalExpenses(data.total_expenses);
-    } catch (error) {
-      console.error('Error fetching summary:', error);
+  const applyExpenseDelta = (delta) => {
+    if (delta.today_expenses.length > 0) {
+      setExpenses((previous) => {
+        const known = new Set(previous.map((expense) => expense._id));
+        const added = delta.today_expenses.filter((expense) => !known.has(expense._id));
+        return [...added, ...previous].sort((a, b) => new Date(b.date) - new Date(a.date));
+      });
     }
+    setTotalExpenses((previous) => previous + delta.total_delta);
+
+    setCategoryData((previous) => {
+      const updated = previous.map((entry) => ({ ...entry }));
+      Object.entries(delta.category_deltas).forEach(([category, change]) => {
+        const entry = updated.find((item) => item.category === category);
+        if (entry) {
+          entry.total += change.total;
+          entry.count += change.count;
+        } else {
+          updated.push({ category, total: change.total, count: change.count });
+        }
+      });
+      return updated;
+    });
+    setCategoriesChanged(true);
+
+    setMonthlyData((previous) => {
+      const updated = previous.map((entry) => ({ ...entry }));
+      Object.entries(delta.month_deltas).forEach(([month, change]) => {
+        const entry = updated.find((item) => item.month === month);
+        if (entry) {
+          entry.total += change.total;
+          entry.count += change.count;
+        } else {
+          updated.push({ month, total: change.total, count: change.count });
+        }
+      });
+      return updated;
+    });
+
+    setWeeklyData((previous) => {
+      const updated = previous.map((entry) => ({ ...entry }));
+      Object.entries(delta.week_deltas || {}).forEach(([key, change]) => {
+        const entry = updated.find((item) => item.key === key);
+        if (entry) {
+          entry.total += change.total;
+          entry.count += change.count;
+        } else {
+          updated.push({ key, total: change.total, count: change.count });
+        }
+      });
+      // Weeks are labelled by position, oldest first, like /weekly_trends
+      return updated
+        .sort((a, b) => a.key.localeCompare(b.key))
+        .map((entry, index) => ({ ...entry, week: `Week ${index + 1}` }));
+    });
   };
 
-  const fetchChartData = async () => {
+  // Top categories are the five largest category totals; recompute them after a delta
+  useEffect(() => {
+    if (!categoriesChanged) return;
+    setTopCategories(
+      [...categoryData]
+        .sort((a, b) => b.total - a.total)
+        .slice(0, 5)
+        .map(({ category, total }) => ({ category, total }))
+    );
+    setCategoriesChanged(false);
+  }, [categoryData, categoriesChanged]);
+
+  const fetchDashboard = async () => {
     try {
-      const [categoryRes, monthlyRes, weeklyRes, topRes] = await Promise.all([
-        fetch(`${API_BASE}/category_summary`),
-        fetch(`${API_BASE}/monthly_trends`),
-        fetch(`${API_BASE}/weekly_trends`),
-        fetch(`${API_BASE}/top_categories`)
-      ]);
-
-      const categoryData = await categoryRes.json();
-      const monthlyData = await monthlyRes.json();
-      const weeklyData = await weeklyRes.json();
-      const topData = await topRes.json();
-
-      setCategoryData(categoryData);
-      setMonthlyData(monthlyData);
-      setWeeklyData(weeklyData);
-      setTopCategories(topData);
+      const response = await fetch(`${API_BASE}/dashboard`);
+      const data = await response.json();
+
+      setExpenses(data.today_expenses.items);
+      setTotalExpenses(data.summary.total_expenses);
+      setCategoryData(data.category_summary);
+      setMonthlyData(data.monthly_trends);
+      setWeeklyData(data.weekly_trends);
+      setTopCategories(data.top_categories);
     } catch (error) {
-      console.error('Error fetching chart data:', error);
+      console.error('Error fetching dashboard:', error);
     }
   };
 
@@ -113,6 +200,7 @@ const App = () => {
       const parsedData = await parseResponse.json();
       
       // Add expense
+      const writeStartedAt = Date.now();
       const addResponse = await fetch(`${API_BASE}/add_expense`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
@@ -124,9 +212,7 @@ const App = () => {
       }
       
       setMessage('');
-      fetchTodayExpenses();
-      fetchSummary();
-      fetchChartData();
+      refreshAfterWrite(writeStartedAt);
       showNotification(`Expense added successfully! Categorized as: ${parsedData.category} 🎉`);
     } catch (error) {
       console.error('Error:', error);
@@ -148,9 +234,12 @@ const App = () => {
         title: manualExpense.title,
         amount: parseFloat(manualExpense.amount),
         date: manualExpense.date || new Date().toISOString(),
-        category: manualExpense.category || 'Other'
+        category: manualExpense.category || 'Other',
+        // A category picked in the form overrides the categorizer for this title
+        category_corrected: Boolean(manualExpense.category)
       };
 
+      const writeStartedAt = Date.now();
       const response = await fetch(`${API_BASE}/add_expense`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
@@ -163,9 +252,7 @@ const App = () => {
 
       setManualExpense({ title: '', amount: '', date: '', category: '' });
       setShowAddForm(false);
-      fetchTodayExpenses();
-      fetchSummary();
-      fetchChartData();
+      refreshAfterWrite(writeStartedAt);
       showNotification('Expense added successfully! 🎉');
     } catch (error) {
       console.error('Error:', error);